@@ -2,31 +2,77 @@
 Flask Backend for Smart City Resource Optimization System
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
 from datetime import datetime
+import csv
+import io
+import itertools
+import json
 import os
+import threading
+import time
 from dotenv import load_dotenv
 import sys
 
 # Add models directory to path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from models.predict import ModelPredictor
+from models.predict import ModelPredictor, BATCH_METHODS
+from models.scheduler import InferenceScheduler
+from utils.prediction_store import PredictionStore
+from utils.report_jobs import ReportJobQueue
+from utils.charts import ChartRenderer, chart_specs
+from utils.report_summary import module_summary, report_fields
+from utils.metrics import init_metrics
+from utils.profiling import init_profiling, unprofiled
 
 load_dotenv()
 
 app = Flask(__name__)
-CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True)
+CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True, expose_headers=['ETag'])
 
-# In-memory storage for predictions (session-based)
-predictions_storage = {
-    'traffic': [],
-    'energy': [],
+# In-memory storage for predictions (session-based), bounded per module
+prediction_store = PredictionStore(
+    capacity=int(os.getenv('PREDICTION_STORE_CAPACITY', 10000)),
+    max_age_seconds=float(os.getenv('PREDICTION_RETENTION_SECONDS', 0)) or None
+)
+
+# Required input fields per prediction module
+REQUIRED_FIELDS = {
+    'traffic': ['hour', 'day_of_week', 'month', 'temperature', 'weather'],
+    'energy': ['hour', 'month', 'temperature', 'population_density'],
     'water': [],
-    'waste': [],
-    'air': []
+    'waste': ['day_of_week', 'location', 'waste_type'],
+    'air': ['month', 'day_of_week', 'temperature', 'wind_speed', 'pm25', 'pm10', 'no2', 'co']
 }
 
+# Upper bound on records accepted by a single batch request
+MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', 10000))
+
+# Stats stream (SSE) tuning
+STATS_STREAM_MAX_RATE = float(os.getenv('STATS_STREAM_MAX_RATE', 1))        # pushes per second
+STATS_STREAM_KEEPALIVE = float(os.getenv('STATS_STREAM_KEEPALIVE', 15))     # seconds
+STATS_STREAM_MAX_SECONDS = float(os.getenv('STATS_STREAM_MAX_SECONDS', 300))  # client reconnects after
+# Open streams per worker process; keep below the gunicorn thread count so
+# streams can't take every thread (clients over the limit fall back to polling)
+STATS_STREAM_MAX_CLIENTS = int(os.getenv('STATS_STREAM_MAX_CLIENTS', 4))
+stats_stream_slots = threading.BoundedSemaphore(STATS_STREAM_MAX_CLIENTS)
+
+# Scenario grid sweeps: cell cap, model call size, and the size above which results are streamed
+SCENARIO_MAX_CELLS = int(os.getenv('SCENARIO_MAX_CELLS', 1000000))
+SCENARIO_CHUNK_SIZE = int(os.getenv('SCENARIO_CHUNK_SIZE', 65536))
+SCENARIO_STREAM_CELLS = int(os.getenv('SCENARIO_STREAM_CELLS', 100000))
+
+# Cursor pages of /api/predictions hold at most this many rows; NDJSON/CSV
+# exports are written out in chunks of EXPORT_CHUNK_ROWS rows
+MAX_PAGE_SIZE = 10000
+EXPORT_CHUNK_ROWS = 500
+
+# PDF responses are written out in chunks of this many bytes
+PDF_CHUNK_SIZE = 64 * 1024
+# Most recent predictions listed per module in the PDF report
+REPORT_DETAIL_ROWS = int(os.getenv('REPORT_DETAIL_ROWS', 10))
+
 # No database - session-based only
 print("[OK] Running in SESSION MODE (in-memory storage)")
 
@@ -37,7 +83,13 @@ print("Initializing ML Models...")
 print("=" * 60)
 try:
     predictor = ModelPredictor()
-    print("\n[OK] ML models initialized successfully!")
+    if predictor.lazy:
+        print("\n[OK] Lazy model loading enabled - models load on first use")
+    else:
+        print("\n[OK] ML models initialized successfully!")
+    for name, info in predictor.load_report()['models'].items():
+        loaded = f"loaded in {info['load_seconds']:.2f}s" if info['loaded'] else "not loaded"
+        print(f"  {name:<8} {loaded}")
     print("=" * 60 + "\n")
 except Exception as e:
     print("\n" + "=" * 60)
@@ -49,6 +101,56 @@ except Exception as e:
     print("=" * 60 + "\n")
     predictor = None
 
+# Prometheus /metrics (request latency, predictor stages, store sizes, load times)
+if init_metrics(app, predictor, prediction_store):
+    print("[OK] Metrics enabled at /metrics")
+else:
+    print("[WARNING] prometheus_client not installed - /metrics disabled")
+
+# Sampled cProfile of requests (PROFILING_ENABLED / PROFILING_ADMIN_TOKEN)
+profiler = init_profiling(app)
+if profiler.sample_rate or profiler.admin_token:
+    print(f"[OK] Request profiling enabled (sample rate {profiler.sample_rate}, saving to {profiler.directory})")
+
+def not_modified(etag):
+    """304 response if the client's If-None-Match already holds this ETag, else None"""
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    return None
+
+def with_etag(response, etag):
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+# Optional micro-batching of concurrent single-row requests
+scheduler = None
+if predictor and os.getenv('INFERENCE_BATCHING', '0').lower() in ('1', 'true', 'yes'):
+    overrides = {}
+    for module in BATCH_METHODS:
+        config = {}
+        if os.getenv(f'INFERENCE_BATCH_WINDOW_MS_{module.upper()}'):
+            config['window_ms'] = float(os.getenv(f'INFERENCE_BATCH_WINDOW_MS_{module.upper()}'))
+        if os.getenv(f'INFERENCE_MAX_BATCH_{module.upper()}'):
+            config['max_batch'] = int(os.getenv(f'INFERENCE_MAX_BATCH_{module.upper()}'))
+        overrides[module] = config
+    scheduler = InferenceScheduler(
+        predictor,
+        window_ms=float(os.getenv('INFERENCE_BATCH_WINDOW_MS', 2)),
+        max_batch=int(os.getenv('INFERENCE_MAX_BATCH', 64)),
+        overrides=overrides
+    )
+    print("[OK] Inference micro-batching enabled")
+
+def run_prediction(module, data):
+    """Single-row prediction, coalesced with concurrent requests when batching is enabled"""
+    if scheduler:
+        return scheduler.submit(module, data)
+    return predictor.predict_batch(module, [data])[0]
+
 # No authentication required - session-based only
 
 @app.route('/')
@@ -61,7 +163,8 @@ def home():
             'energy': '/predict/energy',
             'water': '/predict/water',
             'waste': '/predict/waste',
-            'air': '/predict/air'
+            'air': '/predict/air',
+            'batch': '/predict/<module>/batch'
         }
     })
 
@@ -117,21 +220,16 @@ def predict_traffic():
         data = request.json
         
         # Validate required fields
-        required_fields = ['hour', 'day_of_week', 'month', 'temperature', 'weather']
+        required_fields = REQUIRED_FIELDS['traffic']
         for field in required_fields:
             if field not in data:
                 return jsonify({'error': f'Missing required field: {field}'}), 400
         
         # Make prediction
-        result = predictor.predict_traffic(data)
+        result = run_prediction('traffic', data)
         
         # Store prediction in memory
-        prediction_record = {
-            'timestamp': datetime.now().isoformat(),
-            'input': data,
-            'result': result
-        }
-        predictions_storage['traffic'].append(prediction_record)
+        prediction_store.append('traffic', data, result)
         
         return jsonify(result), 200
     except Exception as e:
@@ -147,21 +245,16 @@ def predict_energy():
         data = request.json
         
         # Validate required fields
-        required_fields = ['hour', 'month', 'temperature', 'population_density']
+        required_fields = REQUIRED_FIELDS['energy']
         for field in required_fields:
             if field not in data:
                 return jsonify({'error': f'Missing required field: {field}'}), 400
         
         # Make prediction
-        result = predictor.predict_energy(data)
+        result = run_prediction('energy', data)
         
         # Store prediction in memory
-        prediction_record = {
-            'timestamp': datetime.now().isoformat(),
-            'input': data,
-            'result': result
-        }
-        predictions_storage['energy'].append(prediction_record)
+        prediction_store.append('energy', data, result)
         
         return jsonify(result), 200
     except Exception as e:
@@ -174,21 +267,43 @@ def predict_water():
         if not predictor:
             return jsonify({'error': 'ML models not loaded'}), 500
         
-        # Water prediction uses historical data, so minimal input needed
-        result = predictor.predict_water({})
+        # Water prediction uses historical data unless the body supplies its
+        # own 7-day `sequence`
+        data = request.get_json(silent=True) or {}
+        record = {'sequence': data['sequence']} if isinstance(data, dict) and 'sequence' in data else {}
+        result = run_prediction('water', record)
         
         # Store prediction in memory
-        prediction_record = {
-            'timestamp': datetime.now().isoformat(),
-            'input': {},
-            'result': result
-        }
-        predictions_storage['water'].append(prediction_record)
+        prediction_store.append('water', record, result)
         
         return jsonify(result), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/water/readings', methods=['POST'])
+def append_water_reading():
+    """Append a daily water reading and roll the cached prediction window forward"""
+    try:
+        if not predictor:
+            return jsonify({'error': 'ML models not loaded'}), 500
+        
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Request body must be a JSON object'}), 400
+        
+        # Validate required fields
+        required_fields = ['timestamp', 'consumption_liters', 'temperature', 'precipitation', 'population']
+        for field in required_fields:
+            if field not in data:
+                return jsonify({'error': f'Missing required field: {field}'}), 400
+        
+        row = predictor.append_water_reading(data)
+        return jsonify({'message': 'Reading appended', 'reading': row}), 201
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/predict/waste', methods=['POST'])
 def predict_waste():
     """Predict waste bin fill level"""
@@ -199,21 +314,16 @@ def predict_waste():
         data = request.json
         
         # Validate required fields
-        required_fields = ['day_of_week', 'location', 'waste_type']
+        required_fields = REQUIRED_FIELDS['waste']
         for field in required_fields:
             if field not in data:
                 return jsonify({'error': f'Missing required field: {field}'}), 400
         
         # Make prediction
-        result = predictor.predict_waste(data)
+        result = run_prediction('waste', data)
         
         # Store prediction in memory
-        prediction_record = {
-            'timestamp': datetime.now().isoformat(),
-            'input': data,
-            'result': result
-        }
-        predictions_storage['waste'].append(prediction_record)
+        prediction_store.append('waste', data, result)
         
         return jsonify(result), 200
     except Exception as e:
@@ -229,164 +339,482 @@ def predict_air():
         data = request.json
         
         # Validate required fields
-        required_fields = ['month', 'day_of_week', 'temperature', 'wind_speed', 'pm25', 'pm10', 'no2', 'co']
+        required_fields = REQUIRED_FIELDS['air']
         for field in required_fields:
             if field not in data:
                 return jsonify({'error': f'Missing required field: {field}'}), 400
         
         # Make prediction
-        result = predictor.predict_air_quality(data)
+        result = run_prediction('air', data)
         
         # Store prediction in memory
-        prediction_record = {
-            'timestamp': datetime.now().isoformat(),
-            'input': data,
-            'result': result
-        }
-        predictions_storage['air'].append(prediction_record)
+        prediction_store.append('air', data, result)
         
         return jsonify(result), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/predict/<module>/batch', methods=['POST'])
+def predict_batch(module):
+    """Predict a batch of records for one module in a single model call
+    
+    Accepts a JSON array of input records (or {"records": [...]}) and returns
+    one result per record in the same order. Invalid rows get an inline error
+    result instead of failing the whole batch; only successful rows are stored.
+    """
+    try:
+        if not predictor:
+            return jsonify({'error': 'ML models not loaded'}), 500
+        
+        if module not in BATCH_METHODS:
+            return jsonify({'error': f'Unknown module: {module}'}), 404
+        
+        data = request.get_json(silent=True)
+        records = data.get('records') if isinstance(data, dict) else data
+        if not isinstance(records, list):
+            return jsonify({'error': 'Expected a JSON array of records'}), 400
+        if len(records) > MAX_BATCH_SIZE:
+            return jsonify({'error': f'Batch too large: {len(records)} records (max {MAX_BATCH_SIZE})'}), 413
+        
+        # Make predictions
+        results = predictor.predict_batch(module, records)
+        
+        # Store successful predictions in memory
+        errors = 0
+        for record, result in zip(records, results):
+            if result.get('status') != 'success':
+                errors += 1
+                continue
+            prediction_store.append(module, record, result)
+        
+        return jsonify({
+            'results': results,
+            'count': len(results),
+            'errors': errors
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def run_forecast(forecast):
+    """Run a ModelPredictor.forecast_* method on the request body"""
+    try:
+        if not predictor:
+            return jsonify({'error': 'ML models not loaded'}), 500
+        
+        data = request.get_json(silent=True)
+        if data is None:
+            data = {}
+        return jsonify(forecast(data)), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/forecast/energy', methods=['POST'])
+def forecast_energy():
+    """Hourly energy consumption forecast (start, hours, temperature/population profiles)"""
+    return run_forecast(lambda data: predictor.forecast_energy(data))
+
+@app.route('/forecast/traffic', methods=['POST'])
+def forecast_traffic():
+    """Hourly traffic forecast (start, hours, temperature/weather profiles)"""
+    return run_forecast(lambda data: predictor.forecast_traffic(data))
+
+@app.route('/forecast/water', methods=['POST'])
+def forecast_water():
+    """Daily water consumption forecast for the days after the latest reading"""
+    return run_forecast(lambda data: predictor.forecast_water(data))
+
+@app.route('/scenario/<module>', methods=['POST'])
+def scenario_sweep(module):
+    """What-if sweep over the Cartesian product of input ranges
+    
+    Body: {"grid": {input: [values] | {"start", "stop", "step"|"num"}, ...},
+           "fixed": {input: value, ...}}. Returns the axes and a nested
+    `values` matrix with one dimension per grid axis. Grids larger than
+    SCENARIO_STREAM_CELLS (or with ?stream=1) are streamed as NDJSON: a header
+    line with the axes, then {"offset", "values"} lines of flat row-major cells.
+    """
+    try:
+        if not predictor:
+            return jsonify({'error': 'ML models not loaded'}), 500
+        
+        try:
+            plan = predictor.scenario_plan(module, request.get_json(silent=True))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if plan['cells'] > SCENARIO_MAX_CELLS:
+            return jsonify({'error': f'Grid too large: {plan["cells"]} cells (max {SCENARIO_MAX_CELLS})'}), 413
+        
+        header = {
+            'module': module,
+            'output': plan['output'],
+            'axes': [{'name': axis['name'], 'values': axis['values']} for axis in plan['axes']],
+            'shape': list(plan['shape']),
+            'cells': plan['cells']
+        }
+        stream = request.args.get('stream', '').lower() in ('1', 'true', 'yes')
+        if not stream and plan['cells'] <= SCENARIO_STREAM_CELLS:
+            values = predictor.scenario_matrix(plan, SCENARIO_CHUNK_SIZE)
+            return jsonify({**header, 'values': values}), 200
+        
+        def generate():
+            yield json.dumps({**header, 'chunk_size': SCENARIO_CHUNK_SIZE}) + '\n'
+            try:
+                for offset, values in predictor.scenario_chunks(plan, SCENARIO_CHUNK_SIZE):
+                    yield json.dumps({'offset': offset, 'values': values.tolist()}) + '\n'
+            except Exception as e:
+                yield json.dumps({'error': str(e)}) + '\n'
+        
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/models/status', methods=['GET'])
+def models_status():
+    """Report which models are loaded and how long each load took"""
+    if not predictor:
+        return jsonify({'error': 'ML models not loaded'}), 500
+    return jsonify(predictor.load_report()), 200
+
+@app.route('/api/inference/stats', methods=['GET'])
+def inference_stats():
+    """Achieved micro-batch sizes per module"""
+    if not scheduler:
+        return jsonify({'enabled': False}), 200
+    return jsonify({'enabled': True, 'modules': scheduler.stats()}), 200
+
+def prediction_row(module, seq, record):
+    return {'module': module, 'seq': seq, **record}
+
+def prediction_modules(module):
+    """Modules selected by the `module` query argument (all when absent)"""
+    if not module:
+        return prediction_store.modules
+    if module not in prediction_store:
+        raise ValueError(f"Unknown module: {module}")
+    return [module]
+
+def prediction_start(cursor, modules):
+    """Parsed `cursor` query argument; empty means the oldest retained prediction"""
+    if not cursor:
+        return None
+    start = prediction_store.parse_cursor(cursor)
+    if start[0] not in modules:
+        raise ValueError(f"Cursor is for module {start[0]}")
+    return start
+
+def predictions_page(modules, start, limit):
+    """One page of predictions after a cursor, with the cursor for the next page"""
+    rows = prediction_store.iter_records(modules, start, chunk_size=min(limit + 1, 1000))
+    predictions, has_more = [], False
+    for module, seq, record in rows:
+        if len(predictions) == limit:
+            has_more = True
+            break
+        predictions.append(prediction_row(module, seq, record))
+    rows.close()
+    
+    if predictions:
+        next_cursor = prediction_store.cursor(predictions[-1]['module'], predictions[-1]['seq'] + 1)
+    else:
+        next_cursor = prediction_store.cursor(*(start or (modules[0], 0)))
+    return jsonify({'predictions': predictions, 'next_cursor': next_cursor, 'has_more': has_more}), 200
+
+def export_predictions(modules, start, limit, export_format):
+    """Stream predictions as NDJSON or CSV straight from the store
+
+    The export covers the rows present when it starts; X-Next-Cursor
+    continues after them (in the last exported module).
+    """
+    stop = prediction_store.next_sequences(modules)
+    rows = prediction_store.iter_records(modules, start, stop)
+    if limit:
+        rows = itertools.islice(rows, limit)
+    
+    if export_format == 'csv':
+        columns = []
+        for module in modules:
+            for section, names in prediction_store.fields(module).items():
+                columns += [f'{section}.{name}' for name in names if f'{section}.{name}' not in columns]
+        
+        def generate():
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(['module', 'seq', 'timestamp'] + columns)
+            for count, (module, seq, record) in enumerate(rows, 1):
+                values = {f'{section}.{name}': value
+                          for section in ('input', 'result') for name, value in record[section].items()}
+                writer.writerow([module, seq, record['timestamp']] + [values.get(column, '') for column in columns])
+                if count % EXPORT_CHUNK_ROWS == 0:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+            yield buffer.getvalue()
+        mimetype = 'text/csv'
+    else:
+        def generate():
+            lines = []
+            for module, seq, record in rows:
+                lines.append(json.dumps(prediction_row(module, seq, record)))
+                if len(lines) == EXPORT_CHUNK_ROWS:
+                    yield '\n'.join(lines) + '\n'
+                    lines = []
+            if lines:
+                yield '\n'.join(lines) + '\n'
+        mimetype = 'application/x-ndjson'
+    
+    response = Response(stream_with_context(generate()), mimetype=mimetype)
+    if not limit:
+        response.headers['X-Next-Cursor'] = prediction_store.cursor(modules[-1], stop[modules[-1]])
+    if export_format == 'csv':
+        response.headers['Content-Disposition'] = (
+            f'attachment; filename=predictions_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+        )
+    return response
+
 @app.route('/api/predictions', methods=['GET'])
 def get_predictions():
-    """Get predictions - session-based only"""
+    """Get predictions - session-based only
+    
+    Without `cursor`/`format` this returns the newest `limit` predictions.
+    `cursor` (empty for the oldest) pages forward with a `next_cursor`, and
+    `format=ndjson|csv` streams every retained prediction (from `cursor`, up
+    to an optional `limit`) without building the response in memory.
+    """
     try:
         module = request.args.get('module')
-        limit = int(request.args.get('limit', 100))
+        export_format = request.args.get('format', 'json')
+        cursor = request.args.get('cursor')
         
-        if module and module in predictions_storage:
-            predictions = predictions_storage[module][-limit:]
+        if export_format in ('ndjson', 'csv'):
+            modules = prediction_modules(module)
+            limit = request.args.get('limit', type=int)
+            return export_predictions(modules, prediction_start(cursor, modules), limit, export_format)
+        if export_format != 'json':
+            raise ValueError("format must be one of: json, ndjson, csv")
+        
+        limit = int(request.args.get('limit', 100))
+        if cursor is not None:
+            modules = prediction_modules(module)
+            limit = max(1, min(limit, MAX_PAGE_SIZE))
+            return predictions_page(modules, prediction_start(cursor, modules), limit)
+        
+        # Answer unchanged polls without re-serializing anything
+        modules = [module] if module and module in prediction_store else None
+        etag = prediction_store.etag(modules, extra=f'limit{limit}')
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        
+        if module and module in prediction_store:
+            predictions = prediction_store.records(module, limit)
         else:
             # Return all predictions from all modules
             all_predictions = []
-            for mod, preds in predictions_storage.items():
-                for pred in preds[-limit:]:
+            for mod in prediction_store.modules:
+                for pred in prediction_store.records(mod, limit):
                     all_predictions.append({
                         'module': mod,
                         **pred
                     })
             predictions = all_predictions[-limit:]
         
-        return jsonify({'predictions': predictions}), 200
+        return with_etag(jsonify({'predictions': predictions}), etag), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Report charts: PNGs cached by their input data. Rendered in the request
+# thread by default: pool processes re-import the main script, which under
+# `python app.py` (or Windows, where they are spawned) means every one of them
+# loads all the models again. gunicorn.conf.py turns the pool on, since there
+# the main script is gunicorn's own launcher
+chart_renderer = ChartRenderer(
+    max_workers=int(os.getenv('CHART_WORKERS', 0)),
+    cache_size=int(os.getenv('CHART_CACHE_SIZE', 64))
+)
+
+def report_snapshot():
+    """(store version, report data) read under one store lock, so both describe the same data
+    
+    Cheap enough for the request thread; rendering the charts and the PDF
+    from it is the slow part.
+    """
+    with prediction_store.locked():
+        version = prediction_store.etag()
+        
+        # Stats come from the store's running aggregates
+        stats_data = prediction_store.stats()
+        
+        # Summaries and charts come from vectorized passes over the stored columns;
+        # only the last REPORT_DETAIL_ROWS predictions per module are copied out
+        summaries, module_specs, recent_predictions = {}, {}, {}
+        for module in prediction_store.modules:
+            columns = prediction_store.columns(module, report_fields(module))
+            summaries[module] = module_summary(module, columns)
+            module_specs[module] = chart_specs(module, columns['result'])
+            recent_predictions[module] = [
+                dict(pred, module=module)
+                for pred in prediction_store.records(module, limit=REPORT_DETAIL_ROWS)
+            ]
+    return version, {'stats': stats_data, 'summaries': summaries, 'chart_specs': module_specs,
+                     'recent_predictions': recent_predictions}
+
+def build_pdf_report(output, snapshot=None):
+    """Write the PDF report of `snapshot` (default: the current predictions) to `output` (a path or file object)"""
+    from utils.pdf_generator import PDFReportGenerator
+    
+    if snapshot is None:
+        _, snapshot = report_snapshot()
+    module_specs = snapshot['chart_specs']
+    
+    # Charts for all modules are rendered together (cached ones are reused)
+    images = iter(chart_renderer.render([spec for specs in module_specs.values() for spec in specs]))
+    charts = {module: [next(images) for _ in specs] for module, specs in module_specs.items()}
+    
+    # Generate PDF
+    generator = PDFReportGenerator()
+    generator.generate_report(snapshot['stats'], snapshot['recent_predictions'], output,
+                              charts=charts, summaries=snapshot['summaries'],
+                              recent_limit=REPORT_DETAIL_ROWS)
+
+def build_pdf_bytes(snapshot=None):
+    buffer = io.BytesIO()
+    build_pdf_report(buffer, snapshot)
+    return buffer.getvalue()
+
+# Background report builds, cached per prediction store version
+report_jobs = ReportJobQueue(
+    build_pdf_bytes,
+    max_workers=int(os.getenv('REPORT_WORKERS', 2)),
+    max_jobs=int(os.getenv('REPORT_MAX_JOBS', 16))
+)
+
+def report_filename():
+    return f'smart_city_report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf'
+
+def pdf_response(pdf, etag=None):
+    """Stream in-memory PDF bytes to the client in chunks, with Content-Length set"""
+    def generate():
+        view = memoryview(pdf)
+        for start in range(0, len(view), PDF_CHUNK_SIZE):
+            yield view[start:start + PDF_CHUNK_SIZE].tobytes()
+    
+    response = Response(generate(), mimetype='application/pdf')
+    response.headers['Content-Length'] = str(len(pdf))
+    response.headers['Content-Disposition'] = f'attachment; filename={report_filename()}'
+    if etag:
+        response = with_etag(response, etag)
+    return response
+
 @app.route('/api/generate-pdf', methods=['GET'])
 def generate_pdf_report():
     """Generate PDF report - session-based only (empty data)"""
     try:
-        from utils.pdf_generator import PDFReportGenerator
-        import tempfile
-        
-        # Calculate stats from stored predictions
-        traffic_preds = predictions_storage['traffic']
-        energy_preds = predictions_storage['energy']
-        water_preds = predictions_storage['water']
-        waste_preds = predictions_storage['waste']
-        air_preds = predictions_storage['air']
-        
-        traffic_high = sum(1 for p in traffic_preds if p['result'].get('congestion_level') == 'High')
-        energy_consumptions = [p['result'].get('predicted_consumption_kwh', 0) for p in energy_preds if p['result'].get('status') == 'success']
-        energy_avg = sum(energy_consumptions) / len(energy_consumptions) if energy_consumptions else 0
-        water_consumptions = [p['result'].get('predicted_consumption_liters', 0) for p in water_preds if p['result'].get('status') == 'success']
-        water_avg = sum(water_consumptions) / len(water_consumptions) if water_consumptions else 0
-        waste_collections = sum(1 for p in waste_preds if p['result'].get('collection_needed') == 'Yes')
-        air_unhealthy = sum(1 for p in air_preds if p['result'].get('quality_binary') == 0)
-        
-        stats_data = {
-            'traffic': {'total': len(traffic_preds), 'high_congestion': traffic_high},
-            'energy': {'total': len(energy_preds), 'avg_consumption': round(energy_avg, 2)},
-            'water': {'total': len(water_preds), 'avg_consumption': round(water_avg, 2)},
-            'waste': {'total': len(waste_preds), 'collection_needed': waste_collections},
-            'air': {'total': len(air_preds), 'unhealthy_days': air_unhealthy},
-            'total_predictions': len(traffic_preds) + len(energy_preds) + len(water_preds) + len(waste_preds) + len(air_preds)
-        }
-        
-        # Collect all predictions for PDF
-        all_predictions = []
-        for module, preds in predictions_storage.items():
-            for pred in preds:
-                all_predictions.append({
-                    'module': module,
-                    'timestamp': pred['timestamp'],
-                    'input': pred['input'],
-                    'result': pred['result']
-                })
-        
-        # Generate PDF
-        generator = PDFReportGenerator()
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf', dir='.')
-        pdf_path = temp_file.name
-        temp_file.close()
-        
-        generator.generate_report(stats_data, all_predictions, pdf_path)
-        
-        # Return PDF file
-        from flask import send_file
-        return send_file(
-            pdf_path,
-            as_attachment=True,
-            download_name=f'smart_city_report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf',
-            mimetype='application/pdf'
-        )
+        # Built in memory; nothing is written to disk
+        return pdf_response(build_pdf_bytes())
     except Exception as e:
         return jsonify({'error': f'Error generating PDF: {str(e)}'}), 500
 
+def report_job_info(job):
+    info = job.to_dict()
+    info['status_url'] = f'/api/reports/{job.id}'
+    info['result_url'] = f'/api/reports/{job.id}/pdf'
+    return info
+
+@app.route('/api/reports', methods=['POST'])
+def start_report():
+    """Start building a PDF report in the background (reuses the job for unchanged data)"""
+    try:
+        job = report_jobs.find(prediction_store.etag())
+        if job is None:
+            # Keyed by the version the snapshot actually holds, which the
+            # build renders even if predictions arrive while it is queued
+            version, snapshot = report_snapshot()
+            job = report_jobs.submit(version, snapshot)
+        return jsonify(report_job_info(job)), 200 if job.status == 'done' else 202
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/reports/<job_id>', methods=['GET'])
+def report_status(job_id):
+    """Status of a report job"""
+    job = report_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown report job'}), 404
+    return jsonify(report_job_info(job)), 200
+
+@app.route('/api/reports/<job_id>/pdf', methods=['GET'])
+def report_result(job_id):
+    """Download a finished report (202 with the job status while it is still building)"""
+    job = report_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown report job'}), 404
+    if job.status == 'failed':
+        return jsonify({'error': f'Error generating PDF: {job.error}'}), 500
+    if job.status != 'done':
+        return jsonify(report_job_info(job)), 202
+    
+    etag = f'report-{job.key}'
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    return pdf_response(job.pdf, etag)
+
 @app.route('/api/stats', methods=['GET'])
 def get_stats():
-    """Get statistics for dashboard - calculated from stored predictions"""
+    """Get statistics for dashboard - maintained incrementally by the prediction store"""
     try:
-        # Calculate stats from stored predictions
-        traffic_preds = predictions_storage['traffic']
-        energy_preds = predictions_storage['energy']
-        water_preds = predictions_storage['water']
-        waste_preds = predictions_storage['waste']
-        air_preds = predictions_storage['air']
-        
-        # Traffic stats
-        traffic_high = sum(1 for p in traffic_preds if p['result'].get('congestion_level') == 'High')
-        
-        # Energy stats
-        energy_consumptions = [p['result'].get('predicted_consumption_kwh', 0) for p in energy_preds if p['result'].get('status') == 'success']
-        energy_avg = sum(energy_consumptions) / len(energy_consumptions) if energy_consumptions else 0
-        
-        # Water stats
-        water_consumptions = [p['result'].get('predicted_consumption_liters', 0) for p in water_preds if p['result'].get('status') == 'success']
-        water_avg = sum(water_consumptions) / len(water_consumptions) if water_consumptions else 0
-        
-        # Waste stats
-        waste_collections = sum(1 for p in waste_preds if p['result'].get('collection_needed') == 'Yes')
-        
-        # Air stats
-        air_unhealthy = sum(1 for p in air_preds if p['result'].get('quality_binary') == 0)
-        
-        return jsonify({
-            'traffic': {
-                'total': len(traffic_preds),
-                'high_congestion': traffic_high
-            },
-            'energy': {
-                'total': len(energy_preds),
-                'avg_consumption': round(energy_avg, 2)
-            },
-            'water': {
-                'total': len(water_preds),
-                'avg_consumption': round(water_avg, 2)
-            },
-            'waste': {
-                'total': len(waste_preds),
-                'collection_needed': waste_collections
-            },
-            'air': {
-                'total': len(air_preds),
-                'unhealthy_days': air_unhealthy
-            }
-        }), 200
+        etag = prediction_store.etag()
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        return with_etag(jsonify(prediction_store.stats()), etag), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/stats/stream', methods=['GET'])
+@unprofiled
+def stats_stream():
+    """Server-Sent Events stream of dashboard stats
+    
+    Sends the full stats once, then only the modules whose stats changed,
+    and only when a new prediction lands - at most STATS_STREAM_MAX_RATE
+    pushes per second. Comment lines keep idle connections alive. The stream
+    closes after STATS_STREAM_MAX_SECONDS so workers are recycled; EventSource
+    reconnects on its own. Past STATS_STREAM_MAX_CLIENTS open streams the
+    answer is 503 and the dashboard polls instead.
+    """
+    if not stats_stream_slots.acquire(blocking=False):
+        return jsonify({'error': 'Too many open stats streams; poll /api/stats instead'}), 503
+    
+    def generate():
+        deadline = time.monotonic() + STATS_STREAM_MAX_SECONDS
+        min_interval = 1.0 / STATS_STREAM_MAX_RATE if STATS_STREAM_MAX_RATE > 0 else 0
+        last_stats = {}
+        changes = None
+        yield f"retry: {int(min_interval * 1000) + 1000}\n\n"
+        while time.monotonic() < deadline:
+            changes = prediction_store.wait_for_change(changes, timeout=STATS_STREAM_KEEPALIVE)
+            stats = prediction_store.stats()
+            delta = {key: value for key, value in stats.items() if last_stats.get(key) != value}
+            if not delta:
+                yield ": keepalive\n\n"
+                continue
+            last_stats = stats
+            yield f"data: {json.dumps(delta)}\n\n"
+            time.sleep(min_interval)
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    # Runs when the connection closes, even if the stream never started
+    response.call_on_close(stats_stream_slots.release)
+    return response
+
 if __name__ == '__main__':
     # Create necessary directories
     os.makedirs('data', exist_ok=True)
@@ -0,0 +1,386 @@
+"""
+Closed-loop Load Generator for the Smart City API
+
+Replays realistic prediction requests against a running server. Payloads are
+drawn from the same distributions data/generate_data.py uses for the training
+data, at random times of the year.
+
+Usage (from the backend directory, with the server already running):
+    python -m benchmarks.loadgen --url http://localhost:5000 --concurrency 16 --duration 60
+    python -m benchmarks.loadgen --rps 200 --mix traffic=4,energy=2,water=1,waste=2,air=1
+    python -m benchmarks.loadgen --concurrency 32 --pid <gunicorn master pid> --output run.json
+
+Each of the --concurrency workers sends its next request as soon as the
+previous one completes (closed loop); with --rps the workers are paced so the
+total start rate doesn't exceed the target. Every --interval seconds it
+prints throughput, latency percentiles, the error rate, the server's RSS and
+how many predictions the server holds (as reported by whichever worker
+answers /api/stats), so you can see how memory and latency grow with the
+prediction store.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+import urllib.request
+from urllib.parse import urlsplit
+
+import numpy as np
+import pandas as pd
+
+# Add backend directory to path
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+
+from benchmarks.payloads import PREDICT_ROUTES
+from data.generate_data import (
+    sample_air_quality_record,
+    sample_energy_record,
+    sample_traffic_record,
+    sample_waste_record,
+    sample_water_record
+)
+from models.predict import AIR_FEATURES, WATER_FEATURES, WATER_SEQUENCE_LENGTH
+
+DEFAULT_MIX = {'traffic': 1, 'energy': 1, 'water': 1, 'waste': 1, 'air': 1}
+YEAR_START = pd.Timestamp('2024-01-01')
+
+# generate_data.py draws from the global NumPy RNG, which the workers share
+_global_rng_lock = threading.Lock()
+
+
+class PayloadFactory:
+    """Synthesizes request bodies from the training data distributions"""
+
+    def __init__(self, seed=None):
+        self.rng = np.random.RandomState(seed)
+
+    def _random_time(self):
+        return YEAR_START + pd.Timedelta(hours=int(self.rng.randint(365 * 24)))
+
+    def traffic(self):
+        date = self._random_time()
+        record = sample_traffic_record(date)
+        return {
+            'hour': int(record['hour']),
+            'day_of_week': int(record['day_of_week']),
+            'month': int(date.month),
+            'temperature': round(float(record['temperature']), 2),
+            'weather': str(record['weather'])
+        }
+
+    def energy(self):
+        record = sample_energy_record(self._random_time())
+        return {
+            'hour': int(record['hour']),
+            'month': int(record['month']),
+            'temperature': round(float(record['temperature']), 2),
+            'population_density': round(float(record['population_density']), 2)
+        }
+
+    def water(self):
+        # A week of daily readings ending on a random day
+        end = self._random_time().normalize()
+        days = pd.date_range(end=end, periods=WATER_SEQUENCE_LENGTH, freq='D')
+        sequence = []
+        for day in days:
+            record = sample_water_record(day)
+            sequence.append({f: round(float(record[f]), 2) for f in WATER_FEATURES})
+        return {'sequence': sequence}
+
+    def waste(self):
+        date = self._random_time()
+        record = sample_waste_record(date, 'BIN_001')
+        return {
+            'day_of_week': int(date.dayofweek),
+            'location': str(record['location']),
+            'waste_type': str(record['waste_type'])
+        }
+
+    def air(self):
+        date = self._random_time()
+        record = sample_air_quality_record(date)
+        record['month'] = date.month
+        record['day_of_week'] = date.dayofweek
+        return {f: round(float(record[f]), 2) for f in AIR_FEATURES}
+
+    def make(self, module):
+        # Reseed the global RNG from ours so a seeded run is repeatable across threads
+        with _global_rng_lock:
+            np.random.seed(self.rng.randint(2 ** 31))
+            return getattr(self, module)()
+
+
+def parse_mix(text):
+    """'traffic=3,energy=1' -> {'traffic': 3.0, 'energy': 1.0}"""
+    mix = {}
+    for part in text.split(','):
+        if not part.strip():
+            continue
+        module, _, weight = part.partition('=')
+        module = module.strip()
+        if module not in PREDICT_ROUTES:
+            raise ValueError(f'Unknown module in mix: {module}')
+        mix[module] = float(weight or 1)
+    if not mix or sum(mix.values()) <= 0:
+        raise ValueError('Module mix needs at least one positive weight')
+    return mix
+
+
+def read_rss(pid):
+    """Resident memory (bytes) of a process and all its descendants, from /proc"""
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f'/proc/{current}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1]) * 1024
+                        break
+            for task in os.listdir(f'/proc/{current}/task'):
+                with open(f'/proc/{current}/task/{task}/children') as f:
+                    pending.extend(int(child) for child in f.read().split())
+        except (OSError, ValueError):
+            continue
+    return total or None
+
+
+def scrape_rss(base_url):
+    """process_resident_memory_bytes from the server's /metrics (one worker's view)"""
+    try:
+        with urllib.request.urlopen(f'{base_url}/metrics', timeout=2) as response:
+            for line in response.read().decode().splitlines():
+                if line.startswith('process_resident_memory_bytes'):
+                    return float(line.split()[-1])
+    except Exception:
+        pass
+    return None
+
+
+def fetch_store_size(base_url):
+    try:
+        with urllib.request.urlopen(f'{base_url}/api/stats', timeout=2) as response:
+            return json.loads(response.read()).get('total_predictions')
+    except Exception:
+        return None
+
+
+class Recorder:
+    """Thread-safe latency/error samples, per interval and for the whole run"""
+
+    def __init__(self, modules):
+        self.lock = threading.Lock()
+        self.modules = modules
+        self.interval = []
+        self.latencies = {module: [] for module in modules}
+        self.errors = {module: 0 for module in modules}
+        self.status_codes = {}
+
+    def add(self, module, seconds, status):
+        with self.lock:
+            self.interval.append((seconds, status))
+            self.latencies[module].append(seconds)
+            self.status_codes[status] = self.status_codes.get(status, 0) + 1
+            if status != 200:
+                self.errors[module] += 1
+
+    def drain_interval(self):
+        with self.lock:
+            samples, self.interval = self.interval, []
+        return samples
+
+
+def percentiles(seconds):
+    if not seconds:
+        return {'p50_ms': None, 'p95_ms': None, 'p99_ms': None}
+    ms = np.asarray(seconds) * 1000.0
+    return {
+        'p50_ms': round(float(np.percentile(ms, 50)), 2),
+        'p95_ms': round(float(np.percentile(ms, 95)), 2),
+        'p99_ms': round(float(np.percentile(ms, 99)), 2)
+    }
+
+
+class LoadGenerator:
+    def __init__(self, base_url, mix, concurrency, rps=None, duration=30.0, timeout=10.0, seed=None):
+        self.base_url = base_url.rstrip('/')
+        parts = urlsplit(self.base_url)
+        self.scheme, self.host = parts.scheme, parts.netloc
+        self.modules = list(mix)
+        weights = np.array([mix[m] for m in self.modules], dtype=float)
+        self.weights = weights / weights.sum()
+        self.concurrency = concurrency
+        self.rps = rps
+        self.duration = duration
+        self.timeout = timeout
+        self.seed = seed
+        self.recorder = Recorder(self.modules)
+        self._stop = threading.Event()
+        self._pace_lock = threading.Lock()
+        self._next_slot = None
+
+    def _connection(self):
+        if self.scheme == 'https':
+            return http.client.HTTPSConnection(self.host, timeout=self.timeout)
+        return http.client.HTTPConnection(self.host, timeout=self.timeout)
+
+    def _wait_for_slot(self):
+        """Pace request starts to the target RPS across all workers"""
+        with self._pace_lock:
+            now = time.perf_counter()
+            if self._next_slot is None or self._next_slot < now:
+                self._next_slot = now
+            slot = self._next_slot
+            self._next_slot += 1.0 / self.rps
+        delay = slot - time.perf_counter()
+        if delay > 0:
+            self._stop.wait(delay)
+
+    def _worker(self, index):
+        factory = PayloadFactory(None if self.seed is None else self.seed + index)
+        rng = np.random.RandomState(None if self.seed is None else self.seed + 1000 + index)
+        connection = self._connection()
+        while not self._stop.is_set():
+            if self.rps:
+                self._wait_for_slot()
+                if self._stop.is_set():
+                    break
+            module = self.modules[rng.choice(len(self.modules), p=self.weights)]
+            body = json.dumps(factory.make(module))
+            start = time.perf_counter()
+            try:
+                connection.request('POST', PREDICT_ROUTES[module], body=body,
+                                   headers={'Content-Type': 'application/json'})
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+            except Exception:
+                status = 0  # connection error / timeout
+                connection.close()
+                connection = self._connection()
+            self.recorder.add(module, time.perf_counter() - start, status)
+        connection.close()
+
+    def run(self, interval=5.0, pid=None):
+        timeline = []
+        workers = [threading.Thread(target=self._worker, args=(i,), daemon=True)
+                   for i in range(self.concurrency)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+
+        print(f"{'time':>6} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+              f"{'errors':>7} {'rss MB':>8} {'stored':>8}")
+        last = start
+        while not self._stop.is_set():
+            elapsed = time.perf_counter() - start
+            if elapsed >= self.duration:
+                break
+            self._stop.wait(min(interval, self.duration - elapsed))
+            now = time.perf_counter()
+            samples = self.recorder.drain_interval()
+            latencies = [s for s, _ in samples]
+            errors = sum(1 for _, status in samples if status != 200)
+            rss = read_rss(pid) if pid else scrape_rss(self.base_url)
+            point = {
+                'elapsed_s': round(now - start, 1),
+                'requests': len(samples),
+                'rps': round(len(samples) / (now - last), 1) if now > last else 0,
+                **percentiles(latencies),
+                'error_rate': round(errors / len(samples), 4) if samples else 0,
+                'rss_mb': round(rss / 2 ** 20, 1) if rss else None,
+                'stored_predictions': fetch_store_size(self.base_url)
+            }
+            timeline.append(point)
+            last = now
+            print(f"{point['elapsed_s']:>6} {point['rps']:>8} {point['p50_ms'] or 0:>8} "
+                  f"{point['p95_ms'] or 0:>8} {point['p99_ms'] or 0:>8} {point['error_rate']:>7.2%} "
+                  f"{point['rss_mb'] or '-':>8} {point['stored_predictions'] if point['stored_predictions'] is not None else '-':>8}")
+
+        self._stop.set()
+        for worker in workers:
+            worker.join(self.timeout + 1)
+        return self._report(time.perf_counter() - start, timeline)
+
+    def _report(self, elapsed, timeline):
+        recorder = self.recorder
+        all_latencies = [s for module in self.modules for s in recorder.latencies[module]]
+        total = len(all_latencies)
+        errors = sum(recorder.errors.values())
+        return {
+            'config': {
+                'url': self.base_url,
+                'mix': dict(zip(self.modules, self.weights.round(3).tolist())),
+                'concurrency': self.concurrency,
+                'target_rps': self.rps,
+                'duration_s': self.duration
+            },
+            'summary': {
+                'requests': total,
+                'throughput_rps': round(total / elapsed, 1) if elapsed else 0,
+                'error_rate': round(errors / total, 4) if total else 0,
+                'status_codes': {str(code): count for code, count in sorted(recorder.status_codes.items())},
+                **percentiles(all_latencies)
+            },
+            'modules': {
+                module: {
+                    'requests': len(recorder.latencies[module]),
+                    'errors': recorder.errors[module],
+                    **percentiles(recorder.latencies[module])
+                }
+                for module in self.modules
+            },
+            'timeline': timeline
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Closed-loop load generator for the Smart City API')
+    parser.add_argument('--url', default='http://localhost:5000', help='server base URL')
+    parser.add_argument('--mix', default=','.join(f'{m}={w}' for m, w in DEFAULT_MIX.items()),
+                        help='module weights, e.g. traffic=4,energy=2,water=1 (default: equal)')
+    parser.add_argument('--concurrency', type=int, default=8, help='concurrent client connections')
+    parser.add_argument('--rps', type=float, help='target requests per second (default: as fast as possible)')
+    parser.add_argument('--duration', type=float, default=30, help='seconds to run')
+    parser.add_argument('--interval', type=float, default=5, help='seconds between progress lines')
+    parser.add_argument('--timeout', type=float, default=10, help='per-request timeout in seconds')
+    parser.add_argument('--pid', type=int,
+                        help='server PID (e.g. the gunicorn master) to read RSS from /proc, '
+                             'summed over its workers; default scrapes /metrics')
+    parser.add_argument('--seed', type=int, help='seed for repeatable payloads')
+    parser.add_argument('--output', help='write the JSON report to this file')
+    args = parser.parse_args(argv)
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    generator = LoadGenerator(args.url, mix, max(1, args.concurrency), rps=args.rps,
+                              duration=args.duration, timeout=args.timeout, seed=args.seed)
+    report = generator.run(interval=args.interval, pid=args.pid)
+
+    summary = report['summary']
+    print("=" * 60)
+    print(f"{summary['requests']} requests, {summary['throughput_rps']} req/s, "
+          f"{summary['error_rate']:.2%} errors")
+    print(f"latency p50 {summary['p50_ms']} ms, p95 {summary['p95_ms']} ms, p99 {summary['p99_ms']} ms")
+    for module, stats in report['modules'].items():
+        print(f"  {module:<8} {stats['requests']:>7} req  {stats['errors']:>5} err  "
+              f"p50 {stats['p50_ms']} ms  p95 {stats['p95_ms']} ms  p99 {stats['p99_ms']} ms")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"[OK] Report written to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
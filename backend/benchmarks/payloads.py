@@ -0,0 +1,48 @@
+"""
+Request payloads for the benchmarks
+
+Fixed, valid example inputs per prediction module (the values the web
+forms send), so benchmark runs are comparable with each other.
+"""
+
+SAMPLE_PAYLOADS = {
+    'traffic': [
+        {'hour': 8, 'day_of_week': 1, 'month': 5, 'temperature': 24.5, 'weather': 'Sunny'},
+        {'hour': 18, 'day_of_week': 3, 'month': 7, 'temperature': 31.0, 'weather': 'Rainy'},
+        {'hour': 13, 'day_of_week': 6, 'month': 11, 'temperature': 18.2, 'weather': 'Cloudy'}
+    ],
+    'energy': [
+        {'hour': 8, 'month': 5, 'temperature': 24.5, 'population_density': 5000},
+        {'hour': 19, 'month': 7, 'temperature': 33.0, 'population_density': 5600},
+        {'hour': 3, 'month': 1, 'temperature': 12.0, 'population_density': 4400}
+    ],
+    'water': [
+        {}
+    ],
+    'waste': [
+        {'day_of_week': 1, 'location': 'Downtown', 'waste_type': 'Organic'},
+        {'day_of_week': 5, 'location': 'Residential', 'waste_type': 'Recyclable'},
+        {'day_of_week': 6, 'location': 'Industrial', 'waste_type': 'General'}
+    ],
+    'air': [
+        {'month': 5, 'day_of_week': 1, 'temperature': 24.5, 'wind_speed': 10,
+         'pm25': 45, 'pm10': 70, 'no2': 38, 'co': 1.4},
+        {'month': 12, 'day_of_week': 2, 'temperature': 8.0, 'wind_speed': 4,
+         'pm25': 95, 'pm10': 150, 'no2': 60, 'co': 2.3}
+    ]
+}
+
+# URL of each module's single-row prediction route
+PREDICT_ROUTES = {
+    'traffic': '/predict/traffic',
+    'energy': '/predict/energy',
+    'water': '/predict/water',
+    'waste': '/predict/waste',
+    'air': '/predict/air'
+}
+
+
+def payload_cycle(module, count):
+    """`count` payloads for a module, cycling through its samples"""
+    samples = SAMPLE_PAYLOADS[module]
+    return [dict(samples[i % len(samples)]) for i in range(count)]
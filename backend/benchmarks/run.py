@@ -0,0 +1,309 @@
+"""
+Benchmark Suite for the Smart City Backend
+
+Measures single-row and batched ModelPredictor latency, Flask test-client
+latency/throughput of every /predict/* route, /api/stats at growing
+prediction store sizes, and PDF generation time versus prediction count.
+
+Usage (from the backend directory):
+    python -m benchmarks.run --output baseline.json
+    python -m benchmarks.run --compare baseline.json --threshold 0.2
+    python -m benchmarks.run --suite predictor,api --quick
+
+Results are written as JSON with p50/p95/p99 per benchmark. With --compare,
+any benchmark whose p50 or p95 got slower than the baseline by more than
+--threshold is reported and the exit code is 1.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager, redirect_stdout
+from datetime import datetime
+
+import numpy as np
+
+# Add backend directory to path
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+
+from benchmarks.payloads import PREDICT_ROUTES, payload_cycle
+
+SUITES = ['predictor', 'api', 'stats', 'pdf']
+BATCH_SIZES = [1, 10, 100, 1000]
+STORE_SIZES = [10000, 100000, 1000000]
+PDF_SIZES = [100, 10000, 1000000]
+
+
+def summarize(samples, rows=1):
+    """Latency percentiles (milliseconds) for a list of durations in seconds"""
+    ms = np.asarray(samples) * 1000.0
+    total = float(np.sum(samples))
+    summary = {
+        'n': len(samples),
+        'mean_ms': round(float(ms.mean()), 4),
+        'p50_ms': round(float(np.percentile(ms, 50)), 4),
+        'p95_ms': round(float(np.percentile(ms, 95)), 4),
+        'p99_ms': round(float(np.percentile(ms, 99)), 4),
+        'min_ms': round(float(ms.min()), 4),
+        'max_ms': round(float(ms.max()), 4),
+        'ops_per_sec': round(len(samples) / total, 2) if total else None
+    }
+    if rows > 1:
+        summary['rows_per_sec'] = round(len(samples) * rows / total, 2) if total else None
+    return summary
+
+
+def measure(fn, repeat, warmup=3, rows=1):
+    """Call `fn` `warmup` + `repeat` times and summarize the timed calls"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - start)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return summarize(samples, rows)
+
+
+@contextmanager
+def quiet():
+    """Silence the app's startup and progress prints"""
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        yield
+
+
+def load_app():
+    with quiet():
+        import app as app_module
+    if app_module.predictor is None:
+        raise RuntimeError('Models failed to load; run `python setup.py` first')
+    return app_module
+
+
+def bench_predictor(app_module, repeat):
+    """Single-row and batched latency of every ModelPredictor.predict_* method"""
+    from models.predict import BATCH_METHODS
+    predictor = app_module.predictor
+    results = {}
+    for module, method_name in BATCH_METHODS.items():
+        single = getattr(predictor, method_name.replace('_batch', ''))
+        batch = getattr(predictor, method_name)
+        payload = payload_cycle(module, 1)[0]
+        results[f'predictor.{module}.single'] = measure(lambda: single(payload), repeat)
+        for size in BATCH_SIZES:
+            records = payload_cycle(module, size)
+            # Fewer repeats for big batches keeps the run time flat
+            runs = max(5, repeat // max(1, size // 10))
+            results[f'predictor.{module}.batch{size}'] = measure(lambda: batch(records), runs, rows=size)
+    return results
+
+
+def checked(response, route, status=200):
+    """Fail the benchmark if a timed request didn't return `status`, so errors aren't timed as fast results"""
+    if response.status_code != status:
+        raise RuntimeError(f'{route} returned {response.status_code}: {response.get_data(as_text=True)[:500]}')
+    return response
+
+
+def bench_api(app_module, repeat):
+    """Latency and throughput of each /predict/* route through the Flask test client"""
+    client = app_module.app.test_client()
+    results = {}
+    for module, route in PREDICT_ROUTES.items():
+        payload = payload_cycle(module, 1)[0]
+        results[f'api.{module}'] = measure(lambda: checked(client.post(route, json=payload), route), repeat)
+
+        records = payload_cycle(module, 100)
+        batch_route = f'/predict/{module}/batch'
+        results[f'api.{module}.batch100'] = measure(
+            lambda: checked(client.post(batch_route, json={'records': records}), batch_route),
+            max(5, repeat // 10), rows=100
+        )
+    return results
+
+
+def fill_store(app_module, total):
+    """A prediction store holding `total` predictions spread evenly across the modules"""
+    from models.predict import BATCH_METHODS
+    from utils.prediction_store import PredictionStore
+
+    modules = list(PREDICT_ROUTES)
+    per_module = max(1, total // len(modules))
+    store = PredictionStore(capacity=per_module)
+    predictor = app_module.predictor
+    now = time.time()
+    for module in modules:
+        inputs = payload_cycle(module, 16)
+        outputs = getattr(predictor, BATCH_METHODS[module])(inputs)
+        for i in range(per_module):
+            store.append(module, inputs[i % 16], outputs[i % 16], timestamp=now - per_module + i)
+    return store
+
+
+@contextmanager
+def swapped_store(app_module, store):
+    """Point the app's routes at another prediction store for the duration"""
+    original = app_module.prediction_store
+    app_module.prediction_store = store
+    try:
+        yield
+    finally:
+        app_module.prediction_store = original
+
+
+def bench_stats(app_module, repeat, sizes):
+    """/api/stats latency with 10k/100k/1M stored predictions (full body and 304)"""
+    client = app_module.app.test_client()
+    results = {}
+    for size in sizes:
+        start = time.perf_counter()
+        store = fill_store(app_module, size)
+        print(f"  filled store with {size} predictions in {time.perf_counter() - start:.1f}s")
+        with swapped_store(app_module, store):
+            results[f'api.stats.{size}'] = measure(lambda: checked(client.get('/api/stats'), '/api/stats'), repeat)
+            etag = client.get('/api/stats').headers.get('ETag')
+            results[f'api.stats.{size}.not_modified'] = measure(
+                lambda: checked(client.get('/api/stats', headers={'If-None-Match': etag}), '/api/stats', 304),
+                repeat
+            )
+        del store
+        gc.collect()
+    return results
+
+
+def bench_pdf(app_module, repeat, sizes):
+    """/api/generate-pdf time and peak memory versus the number of stored predictions"""
+    client = app_module.app.test_client()
+    results = {}
+    for size in sizes:
+        store = fill_store(app_module, size)
+        with swapped_store(app_module, store):
+            def call():
+                response = checked(client.get('/api/generate-pdf'), '/api/generate-pdf')
+                response.get_data()
+                response.close()
+            results[f'pdf.{size}'] = measure(call, max(3, repeat // 20), warmup=1)
+            # Python heap peak of one more build (store excluded)
+            tracemalloc.start()
+            call()
+            results[f'pdf.{size}']['peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+            tracemalloc.stop()
+        del store
+        gc.collect()
+    return results
+
+
+def run(suites, repeat, store_sizes, pdf_sizes):
+    app_module = load_app()
+    results = {}
+    for suite in suites:
+        print(f"[{suite}]")
+        start = time.perf_counter()
+        if suite == 'predictor':
+            suite_results = bench_predictor(app_module, repeat)
+        elif suite == 'api':
+            with quiet():
+                suite_results = bench_api(app_module, repeat)
+        elif suite == 'stats':
+            suite_results = bench_stats(app_module, repeat, store_sizes)
+        else:
+            with quiet():
+                suite_results = bench_pdf(app_module, repeat, pdf_sizes)
+        for name, summary in suite_results.items():
+            print(f"  {name:<36} p50 {summary['p50_ms']:>10.3f} ms   p95 {summary['p95_ms']:>10.3f} ms   "
+                  f"p99 {summary['p99_ms']:>10.3f} ms")
+        print(f"  ({time.perf_counter() - start:.1f}s)")
+        results.update(suite_results)
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': np.__version__,
+            'repeat': repeat,
+            'suites': suites
+        },
+        'results': results
+    }
+
+
+def compare(current, baseline, threshold):
+    """Benchmarks whose p50 or p95 regressed by more than `threshold` (a fraction)"""
+    regressions = []
+    for name, summary in current['results'].items():
+        base = baseline.get('results', {}).get(name)
+        if not base:
+            continue
+        for key in ('p50_ms', 'p95_ms'):
+            if base[key] > 0 and summary[key] > base[key] * (1 + threshold):
+                regressions.append({
+                    'benchmark': name,
+                    'metric': key,
+                    'baseline': base[key],
+                    'current': summary[key],
+                    'change_percent': round(100 * (summary[key] / base[key] - 1), 1)
+                })
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Smart City backend benchmarks')
+    parser.add_argument('--suite', default=','.join(SUITES),
+                        help=f'comma-separated suites to run ({", ".join(SUITES)})')
+    parser.add_argument('--repeat', type=int, default=200, help='timed calls per benchmark')
+    parser.add_argument('--quick', action='store_true',
+                        help='fewer repeats and smaller store/PDF sizes for a fast smoke run')
+    parser.add_argument('--output', help='write the JSON results to this file')
+    parser.add_argument('--compare', metavar='BASELINE', help='baseline JSON to check for regressions')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='allowed slowdown before flagging a regression (default 0.2 = 20%%)')
+    args = parser.parse_args(argv)
+
+    suites = [s.strip() for s in args.suite.split(',') if s.strip()]
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        parser.error(f'unknown suite(s): {", ".join(sorted(unknown))}')
+
+    repeat, store_sizes, pdf_sizes = args.repeat, STORE_SIZES, PDF_SIZES
+    if args.quick:
+        repeat, store_sizes, pdf_sizes = min(repeat, 30), STORE_SIZES[:1], PDF_SIZES[:1]
+
+    report = run(suites, repeat, store_sizes, pdf_sizes)
+
+    status = 0
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        report['regressions'] = regressions
+        if regressions:
+            print(f"[WARNING] {len(regressions)} regression(s) over {args.threshold:.0%}:")
+            for r in regressions:
+                print(f"  {r['benchmark']:<36} {r['metric']}  {r['baseline']:.3f} -> "
+                      f"{r['current']:.3f} ms (+{r['change_percent']}%)")
+            status = 1
+        else:
+            print(f"[OK] No regressions over {args.threshold:.0%} against {args.compare}")
+
+    # Written after the comparison so the file records its regressions too
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"[OK] Results written to {args.output}")
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,57 @@
+"""
+Gunicorn settings for the Smart City API
+
+Picked up automatically when gunicorn is started from the backend directory.
+With PROMETHEUS_MULTIPROC_DIR set, every worker writes its metrics to that
+directory so /metrics reports totals across all workers.
+
+Workers are threaded (GUNICORN_THREADS, default 8) so the dashboard's stats
+stream doesn't block other requests.
+
+GUNICORN_PRELOAD=1 (or --preload) loads the app and its models once in the
+master before forking, so the workers share the model memory copy-on-write
+instead of each loading its own.
+"""
+
+import gc
+import os
+import shutil
+
+preload_app = os.getenv('GUNICORN_PRELOAD', '0').lower() in ('1', 'true', 'yes')
+
+# Threaded workers: every open /api/stats/stream connection holds a thread for
+# minutes, which on the default sync worker blocks all other requests until the
+# worker timeout kills it (and its in-memory prediction store). gthread also
+# keeps heartbeating while requests run, so long streams don't trip the timeout
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+
+# Report charts get a process pool here (app.py renders them in the request
+# thread by default, see the comment there)
+os.environ.setdefault('CHART_WORKERS', '2')
+
+# Start from an empty metrics directory so samples from a previous run don't leak in.
+# Done here rather than in on_starting because a preloaded app has already
+# recorded metrics by then; the marker keeps a config reload (HUP) from wiping it again
+_multiproc_dir = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+if _multiproc_dir and not os.getenv('SMARTCITY_METRICS_DIR_READY'):
+    shutil.rmtree(_multiproc_dir, ignore_errors=True)
+    os.makedirs(_multiproc_dir, exist_ok=True)
+    os.environ['SMARTCITY_METRICS_DIR_READY'] = '1'
+
+
+def on_starting(server):
+    if server.cfg.preload_app:
+        # Move the preloaded objects out of the GC's reach so collections in the
+        # workers don't write to (and so copy) the pages shared with the master
+        gc.freeze()
+
+
+def child_exit(server, worker):
+    # Drop the live gauges of a worker that exited
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        try:
+            from prometheus_client import multiprocess
+        except ImportError:
+            return
+        multiprocess.mark_process_dead(worker.pid)
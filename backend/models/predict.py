@@ -2,76 +2,270 @@
 Prediction Functions for ML Models
 """
 
+import hashlib
+import importlib
+import math
 import joblib
 import numpy as np
 import pandas as pd
-from tensorflow.keras.models import load_model
 import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+
+WATER_FEATURES = ['day_of_week', 'month', 'temperature', 'precipitation', 'population']
+WATER_SEQUENCE_LENGTH = 7
+AIR_FEATURES = ['month', 'day_of_week', 'temperature', 'wind_speed', 'pm25', 'pm10', 'no2', 'co']
+
+# Vehicle counts above these are High / Medium congestion
+TRAFFIC_HIGH_CONGESTION = 700
+TRAFFIC_MEDIUM_CONGESTION = 400
+
+# Forecast horizon limits
+FORECAST_MAX_HOURS = 24 * 31
+FORECAST_MAX_DAYS = 90
+
+# Scenario sweeps: model inputs in column order, categorical inputs (-> encoder
+# lookup attribute) and the output each grid cell reports
+SCENARIO_FEATURES = {
+    'traffic': ['hour', 'day_of_week', 'month', 'temperature', 'weather'],
+    'energy': ['hour', 'month', 'temperature', 'population_density'],
+    'waste': ['day_of_week', 'location', 'waste_type'],
+    'air': AIR_FEATURES
+}
+SCENARIO_CATEGORIES = {
+    'traffic': {'weather': 'traffic_weather_lookup'},
+    'waste': {'location': 'waste_location_lookup', 'waste_type': 'waste_type_lookup'}
+}
+SCENARIO_OUTPUTS = {
+    'traffic': 'predicted_vehicle_count',
+    'energy': 'predicted_consumption_kwh',
+    'waste': 'predicted_fill_level_percent',
+    'air': 'quality_binary'
+}
+SCENARIO_MAX_AXIS = 10000
+
+
+def _encoder_lookup(encoder):
+    """Map each label of a fitted LabelEncoder to its integer code"""
+    return {label: code for code, label in enumerate(encoder.classes_)}
+
+
+# Libraries the model pickles import while unpickling (imported once before parallel loading)
+SHARED_IMPORTS = ['sklearn.preprocessing', 'sklearn.linear_model', 'sklearn.neighbors', 'sklearn.ensemble']
+MODEL_NAMES = ['traffic', 'energy', 'water', 'waste', 'air']
+
+# Batch prediction method per module
+BATCH_METHODS = {
+    'traffic': 'predict_traffic_batch',
+    'energy': 'predict_energy_batch',
+    'water': 'predict_water_batch',
+    'waste': 'predict_waste_batch',
+    'air': 'predict_air_quality_batch'
+}
+
+_ACTIVATIONS = {
+    'linear': lambda x: x,
+    'relu': lambda x: np.maximum(x, 0),
+    'tanh': np.tanh,
+    'sigmoid': lambda x: 1 / (1 + np.exp(-x))
+}
+
+
+def lstm_forward(weights, sequences):
+    """Pure-NumPy forward pass of a stacked Keras LSTM + Dense model
+    
+    `weights` is the dict stored in water_lstm.npz (see
+    train_models.export_water_lstm_weights); `sequences` has shape
+    (batch, timesteps, features). Dropout is a no-op at inference time.
+    Returns an array of shape (batch, dense_units).
+    """
+    x = np.asarray(sequences, dtype=np.float32)
+    for i in range(int(weights['n_lstm'])):
+        kernel = weights[f'lstm{i}_kernel']
+        recurrent_kernel = weights[f'lstm{i}_recurrent_kernel']
+        bias = weights[f'lstm{i}_bias']
+        activation = _ACTIVATIONS[str(weights[f'lstm{i}_activation'])]
+        recurrent_activation = _ACTIVATIONS[str(weights[f'lstm{i}_recurrent_activation'])]
+        units = recurrent_kernel.shape[0]
+        
+        # Input projections for every timestep in one matmul
+        z_inputs = x @ kernel + bias
+        h = np.zeros((x.shape[0], units), dtype=np.float32)
+        c = np.zeros((x.shape[0], units), dtype=np.float32)
+        outputs = []
+        for t in range(x.shape[1]):
+            z = z_inputs[:, t, :] + h @ recurrent_kernel
+            # Keras gate order: input, forget, cell candidate, output
+            i_gate = recurrent_activation(z[:, :units])
+            f_gate = recurrent_activation(z[:, units:2 * units])
+            candidate = activation(z[:, 2 * units:3 * units])
+            o_gate = recurrent_activation(z[:, 3 * units:])
+            c = f_gate * c + i_gate * candidate
+            h = o_gate * activation(c)
+            outputs.append(h)
+        x = np.stack(outputs, axis=1)
+    
+    # Last LSTM returns only its final state into the Dense layer
+    dense_activation = _ACTIVATIONS[str(weights['dense_activation'])]
+    return dense_activation(x[:, -1, :] @ weights['dense_kernel'] + weights['dense_bias'])
+
+
+def forest_predict(forest, features, chunk_size=256):
+    """Vectorized evaluation of a compiled RandomForestRegressor
+    
+    `forest` holds the flat node arrays written by
+    train_models.compile_traffic_forest: node ids are global across trees,
+    `children[2 * node]` / `children[2 * node + 1]` are the left/right child
+    and leaves point back to themselves, so every row walks every tree for
+    exactly `max_depth` steps. Rows are processed in chunks to keep the
+    (rows x trees) working arrays cache-sized. Returns the mean leaf value per row.
+    """
+    # sklearn compares float32 inputs against float64 thresholds
+    X = np.asarray(features, dtype=np.float32).astype(np.float64)
+    if not np.isfinite(X).all():
+        raise ValueError('Input X contains NaN or infinity.')
+    if X.shape[0] > chunk_size:
+        return np.concatenate([forest_predict(forest, X[i:i + chunk_size], chunk_size)
+                               for i in range(0, X.shape[0], chunk_size)])
+    
+    n_rows, n_features = X.shape
+    flat = X.ravel()
+    feature = forest['feature']
+    threshold = forest['threshold']
+    children = forest['children']
+    
+    row_offsets = (np.arange(n_rows) * n_features)[:, None]
+    node = np.tile(forest['roots'], (n_rows, 1))
+    for _ in range(int(forest['max_depth'])):
+        go_right = ~(flat[row_offsets + feature[node]] <= threshold[node])
+        node = children[2 * node + go_right]
+    return forest['value'][node].mean(axis=1)
+
+
+def save_array_dir(directory, arrays):
+    """Write each array to <directory>/<name>.npy so it can be memory-mapped on load"""
+    os.makedirs(directory, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(directory, f'{name}.npy'), np.asarray(array))
+
+
+def load_array_dir(directory, mmap=True):
+    """Load the arrays written by save_array_dir
+    
+    With `mmap` the arrays are read-only views of the files, so every worker
+    process shares one copy of them through the OS page cache.
+    """
+    arrays = {}
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith('.npy'):
+            array = np.load(os.path.join(directory, filename), mmap_mode='r' if mmap else None)
+            # Plain ndarray view of the mapping; np.memmap's subclass overhead slows fancy indexing
+            arrays[filename[:-4]] = np.asarray(array)
+    return arrays
+
+
+# Model files each exported artifact is derived from. Exports store a digest
+# of their contents under SOURCE_DIGEST_KEY, and serving only uses an export
+# whose digest still matches (file mtimes don't survive a git checkout)
+ARTIFACT_SOURCES = {
+    'traffic_forest': ['traffic_model.pkl'],
+    'traffic_forest.npz': ['traffic_model.pkl'],
+    'water_lstm.npz': ['water_model.h5'],
+    'energy_fused.npz': ['energy_model.pkl', 'energy_scaler.pkl'],
+    'air_quality_fused.npz': ['air_quality_model.pkl', 'air_quality_scaler.pkl'],
+    'waste_lookup.npz': ['waste_model.pkl', 'waste_scaler.pkl']
+}
+SOURCE_DIGEST_KEY = 'source_digest'
+
+
+def source_digest(models_path, artifact):
+    """SHA-256 over the contents of the model files `artifact` is built from"""
+    digest = hashlib.sha256()
+    for filename in ARTIFACT_SOURCES[artifact]:
+        digest.update(filename.encode())
+        with open(os.path.join(models_path, filename), 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def _artifact_matches_sources(models_path, artifact, arrays):
+    """Whether an exported artifact was built from the model files now on disk
+    
+    An export whose source files aren't deployed at all is used as is.
+    """
+    sources = ARTIFACT_SOURCES[artifact]
+    if not all(os.path.exists(os.path.join(models_path, f)) for f in sources):
+        return True
+    stored = arrays.get(SOURCE_DIGEST_KEY)
+    if stored is None:
+        print(f"[WARNING] {artifact} has no source digest; re-export it to use it")
+        return False
+    if str(stored) != source_digest(models_path, artifact):
+        print(f"[WARNING] {artifact} was built from a different {' / '.join(sources)}")
+        return False
+    return True
+
 
 class ModelPredictor:
-    def __init__(self):
+    def __init__(self, lazy=None):
+        """Load the trained models
+        
+        With `lazy` (or LAZY_MODEL_LOADING=1) nothing is loaded up front;
+        each model and its scalers/encoders load on first use instead.
+        Large arrays (compiled forest nodes, KNN training data) are
+        memory-mapped read-only unless MODEL_MMAP=0.
+        """
         # Get the correct path to models directory
         current_dir = os.path.dirname(os.path.abspath(__file__))
         self.models_path = current_dir
-        self.load_models()
+        if lazy is None:
+            lazy = os.getenv('LAZY_MODEL_LOADING', '0').lower() in ('1', 'true', 'yes')
+        self.lazy = lazy
+        self.mmap = os.getenv('MODEL_MMAP', '1').lower() in ('1', 'true', 'yes')
+        self.load_times = {}
+        self._loaded = set()
+        self._load_locks = {name: threading.Lock() for name in MODEL_NAMES}
+        self._water_window = None
+        self._water_window_lock = threading.Lock()
+        self._waste_knn_lock = threading.Lock()
+        # Optional stage/error/load-time sink (see utils/metrics.py)
+        self.metrics = None
+        if not lazy:
+            self.load_models()
     
     def load_models(self):
-        """Load all trained models"""
+        """Load all trained models
+        
+        The models are independent, so they load concurrently in a thread pool
+        (MODEL_LOAD_WORKERS threads, default one per model; 1 loads them in
+        order). The first failure is raised without waiting for the rest.
+        """
         try:
-            import os
             print(f"Loading models from: {self.models_path}")
-            
-            # Traffic model
-            traffic_model_path = os.path.join(self.models_path, 'traffic_model.pkl')
-            if not os.path.exists(traffic_model_path):
-                raise FileNotFoundError(f"Traffic model not found at {traffic_model_path}. Please run setup.py first.")
-            print("Loading traffic model...")
-            self.traffic_model = joblib.load(traffic_model_path)
-            self.traffic_weather_encoder = joblib.load(os.path.join(self.models_path, 'traffic_weather_encoder.pkl'))
-            print("[OK] Traffic model loaded")
-            
-            # Energy model
-            print("Loading energy model...")
-            self.energy_model = joblib.load(os.path.join(self.models_path, 'energy_model.pkl'))
-            self.energy_scaler = joblib.load(os.path.join(self.models_path, 'energy_scaler.pkl'))
-            print("[OK] Energy model loaded")
-            
-            # Water model
-            print("Loading water model...")
-            water_model_h5 = os.path.join(self.models_path, 'water_model.h5')
-            water_model_pkl = os.path.join(self.models_path, 'water_model.pkl')
-            
-            if os.path.exists(water_model_h5):
-                # LSTM model
-                self.water_model = load_model(water_model_h5, compile=False)
-                self.water_scaler_X = joblib.load(os.path.join(self.models_path, 'water_scaler_X.pkl'))
-                self.water_scaler_y = joblib.load(os.path.join(self.models_path, 'water_scaler_y.pkl'))
-                self.water_model_type = 'lstm'
-            elif os.path.exists(water_model_pkl):
-                # Linear Regression model (fallback)
-                self.water_model = joblib.load(water_model_pkl)
-                self.water_scaler = joblib.load(os.path.join(self.models_path, 'water_scaler.pkl'))
-                self.water_model_type = 'linear'
+            start = time.perf_counter()
+            workers = int(os.getenv('MODEL_LOAD_WORKERS', len(MODEL_NAMES)))
+            if workers <= 1:
+                for name in MODEL_NAMES:
+                    self._ensure_loaded(name)
             else:
-                raise FileNotFoundError("Water model not found. Please run setup.py first.")
-            print("[OK] Water model loaded")
-            
-            # Waste model
-            print("Loading waste model...")
-            self.waste_model = joblib.load(os.path.join(self.models_path, 'waste_model.pkl'))
-            self.waste_scaler = joblib.load(os.path.join(self.models_path, 'waste_scaler.pkl'))
-            self.waste_location_encoder = joblib.load(os.path.join(self.models_path, 'waste_location_encoder.pkl'))
-            self.waste_type_encoder = joblib.load(os.path.join(self.models_path, 'waste_type_encoder.pkl'))
-            print("[OK] Waste model loaded")
-            
-            # Air quality model
-            print("Loading air quality model...")
-            self.air_quality_model = joblib.load(os.path.join(self.models_path, 'air_quality_model.pkl'))
-            self.air_quality_scaler = joblib.load(os.path.join(self.models_path, 'air_quality_scaler.pkl'))
-            print("[OK] Air quality model loaded")
+                # Concurrent first imports of the same package can deadlock on
+                # the import locks, so import the shared libraries here first
+                for module in SHARED_IMPORTS:
+                    importlib.import_module(module)
+                executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='model-load')
+                futures = {executor.submit(self._ensure_loaded, name): name for name in MODEL_NAMES}
+                done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+                failed = [f for f in futures if f in done and f.exception() is not None]
+                executor.shutdown(wait=not failed, cancel_futures=True)
+                if failed:
+                    print(f"[ERROR] {futures[failed[0]].capitalize()} model failed to load")
+                    raise failed[0].exception()
             
             print("=" * 50)
-            print("[OK] All models loaded successfully!")
+            print(f"[OK] All models loaded successfully in {time.perf_counter() - start:.2f}s!")
             print("=" * 50)
         except Exception as e:
             print(f"[ERROR] Error loading models: {e}")
@@ -79,159 +273,902 @@ class ModelPredictor:
             traceback.print_exc()
             raise
     
+    def _ensure_loaded(self, name):
+        """Load one model (and its scalers/encoders) if it isn't loaded yet; thread-safe"""
+        if name in self._loaded:
+            return
+        with self._load_locks[name]:
+            if name in self._loaded:
+                return
+            start = time.perf_counter()
+            getattr(self, f'_load_{name}_model')()
+            self.load_times[name] = time.perf_counter() - start
+            self._loaded.add(name)
+            print(f"[OK] {name.capitalize()} model loaded in {self.load_times[name]:.2f}s")
+            if self.metrics is not None:
+                self.metrics.model_loaded(name, self.load_times[name])
+    
+    def load_report(self):
+        """What has been loaded so far and how long each load took"""
+        return {
+            'lazy': self.lazy,
+            'models': {
+                name: {
+                    'loaded': name in self._loaded,
+                    'load_seconds': round(self.load_times[name], 4) if name in self.load_times else None
+                }
+                for name in MODEL_NAMES
+            },
+            'tensorflow_imported': 'tensorflow' in sys.modules
+        }
+    
+    def _load_traffic_model(self):
+        traffic_model_path = os.path.join(self.models_path, 'traffic_model.pkl')
+        print("Loading traffic model...")
+        self.traffic_forest = None
+        self.traffic_model = None
+        # Compiled flat-array forest - no sklearn estimator needed. The .npy
+        # directory is memory-mapped; traffic_forest.npz is the older format
+        for artifact in ('traffic_forest', 'traffic_forest.npz'):
+            forest_path = os.path.join(self.models_path, artifact)
+            if not os.path.exists(forest_path):
+                continue
+            if os.path.isdir(forest_path):
+                forest = load_array_dir(forest_path, mmap=self.mmap)
+            else:
+                with np.load(forest_path) as arrays:
+                    forest = {key: arrays[key] for key in arrays.files}
+            if _artifact_matches_sources(self.models_path, artifact, forest):
+                self.traffic_forest = forest
+                break
+        else:
+            if not os.path.exists(traffic_model_path):
+                raise FileNotFoundError(f"Traffic model not found at {traffic_model_path}. Please run setup.py first.")
+            self.traffic_model = self._load_pickle('traffic_model.pkl')
+        self.traffic_weather_encoder = joblib.load(os.path.join(self.models_path, 'traffic_weather_encoder.pkl'))
+        self.traffic_weather_lookup = _encoder_lookup(self.traffic_weather_encoder)
+    
+    def _load_pickle(self, filename):
+        """joblib.load a model, memory-mapping its NumPy arrays (e.g. KNN fit data) when enabled"""
+        return joblib.load(os.path.join(self.models_path, filename), mmap_mode='r' if self.mmap else None)
+    
+    def _load_fused(self, name):
+        """Load <name>_fused.npz if it was built from the current model/scaler pickles, else None"""
+        artifact = f'{name}_fused.npz'
+        fused_path = os.path.join(self.models_path, artifact)
+        if not os.path.exists(fused_path):
+            return None
+        with np.load(fused_path) as arrays:
+            fused = {key: arrays[key] for key in arrays.files}
+        if not _artifact_matches_sources(self.models_path, artifact, fused):
+            print(f"[WARNING] Using the {name} pickles")
+            return None
+        return fused
+    
+    def _load_energy_model(self):
+        print("Loading energy model...")
+        # Scaler folded into the regression coefficients - no pickles needed
+        self.energy_fused = self._load_fused('energy')
+        if self.energy_fused is None:
+            self.energy_model = joblib.load(os.path.join(self.models_path, 'energy_model.pkl'))
+            self.energy_scaler = joblib.load(os.path.join(self.models_path, 'energy_scaler.pkl'))
+    
+    def _load_water_model(self):
+        print("Loading water model...")
+        water_model_h5 = os.path.join(self.models_path, 'water_model.h5')
+        water_model_pkl = os.path.join(self.models_path, 'water_model.pkl')
+        
+        water_lstm_npz = os.path.join(self.models_path, 'water_lstm.npz')
+        
+        lstm_weights = None
+        if os.path.exists(water_lstm_npz):
+            with np.load(water_lstm_npz) as weights:
+                lstm_weights = {key: weights[key] for key in weights.files}
+            if not _artifact_matches_sources(self.models_path, 'water_lstm.npz', lstm_weights):
+                lstm_weights = None
+        
+        if lstm_weights is not None:
+            # LSTM weights exported for the NumPy engine - no TensorFlow needed
+            self.water_lstm_weights = lstm_weights
+            self.water_model = None
+            self.water_scaler_X = joblib.load(os.path.join(self.models_path, 'water_scaler_X.pkl'))
+            self.water_scaler_y = joblib.load(os.path.join(self.models_path, 'water_scaler_y.pkl'))
+            self.water_model_type = 'lstm'
+            self.water_engine = 'numpy'
+        elif os.path.exists(water_model_h5):
+            # LSTM model - TensorFlow is only imported when it is actually needed
+            if os.path.exists(water_lstm_npz):
+                print("[WARNING] Run train_models.export_water_lstm_weights() to refresh water_lstm.npz")
+            from tensorflow.keras.models import load_model
+            self.water_model = load_model(water_model_h5, compile=False)
+            self.water_scaler_X = joblib.load(os.path.join(self.models_path, 'water_scaler_X.pkl'))
+            self.water_scaler_y = joblib.load(os.path.join(self.models_path, 'water_scaler_y.pkl'))
+            self.water_model_type = 'lstm'
+            self.water_engine = 'keras'
+        elif os.path.exists(water_model_pkl):
+            # Linear Regression model (fallback)
+            self.water_model = joblib.load(water_model_pkl)
+            self.water_scaler = joblib.load(os.path.join(self.models_path, 'water_scaler.pkl'))
+            self.water_model_type = 'linear'
+            self.water_engine = 'sklearn'
+        else:
+            raise FileNotFoundError("Water model not found. Please run setup.py first.")
+    
+    def _load_waste_model(self):
+        print("Loading waste model...")
+        self.waste_location_encoder = joblib.load(os.path.join(self.models_path, 'waste_location_encoder.pkl'))
+        self.waste_type_encoder = joblib.load(os.path.join(self.models_path, 'waste_type_encoder.pkl'))
+        self.waste_location_lookup = _encoder_lookup(self.waste_location_encoder)
+        self.waste_type_lookup = _encoder_lookup(self.waste_type_encoder)
+        self.waste_model = None
+        self.waste_table = self._load_waste_table()
+        if self.waste_table is None:
+            self._load_waste_knn()
+    
+    def _load_waste_table(self):
+        """Load the precomputed KNN results if they match the current model, scaler and encoders"""
+        table_path = os.path.join(self.models_path, 'waste_lookup.npz')
+        if not os.path.exists(table_path):
+            return None
+        with np.load(table_path) as arrays:
+            lookup = {key: arrays[key] for key in arrays.files}
+        if not _artifact_matches_sources(self.models_path, 'waste_lookup.npz', lookup):
+            print("[WARNING] Using the live KNN model")
+            return None
+        if (list(lookup['locations']) != list(self.waste_location_encoder.classes_) or
+                list(lookup['waste_types']) != list(self.waste_type_encoder.classes_)):
+            print("[WARNING] Waste encoder vocabularies changed; using the live KNN model")
+            return None
+        return lookup['table']
+    
+    def _load_waste_knn(self):
+        """Load the KNN model and scaler (only needed when the lookup table can't answer)"""
+        if self.waste_model is not None:
+            return
+        with self._waste_knn_lock:
+            if self.waste_model is None:
+                self.waste_scaler = joblib.load(os.path.join(self.models_path, 'waste_scaler.pkl'))
+                self.waste_model = self._load_pickle('waste_model.pkl')
+    
+    def _load_air_model(self):
+        print("Loading air quality model...")
+        self.air_quality_fused = self._load_fused('air_quality')
+        if self.air_quality_fused is None:
+            self.air_quality_model = joblib.load(os.path.join(self.models_path, 'air_quality_model.pkl'))
+            self.air_quality_scaler = joblib.load(os.path.join(self.models_path, 'air_quality_scaler.pkl'))
+    
+    def predict_batch(self, module, records):
+        """Predict a batch of records for the given module"""
+        return getattr(self, BATCH_METHODS[module])(records)
+    
+    def _field(self, data, name):
+        """Read a required field from an input record"""
+        if not isinstance(data, dict):
+            raise ValueError('Record must be a JSON object')
+        if name not in data:
+            raise ValueError(f'Missing required field: {name}')
+        return data[name]
+    
+    def _number(self, data, name):
+        """Read a required numeric field, rejecting NaN/infinity per row"""
+        try:
+            value = float(self._field(data, name))
+        except TypeError:
+            raise ValueError(f'{name} must be a number')
+        if not np.isfinite(value):
+            raise ValueError(f'{name} must be a finite number')
+        return value
+    
+    def _encode(self, lookup, value):
+        """Encode a categorical value with a fitted LabelEncoder's vocabulary"""
+        try:
+            known = value in lookup
+        except TypeError:
+            known = False  # unhashable (a list or object) can't be a label
+        if not known:
+            raise ValueError(f'y contains previously unseen labels: {value!r}')
+        return lookup[value]
+    
+    def _observe(self, module, stage, start):
+        """Report time spent in one stage since `start`; returns the new start"""
+        now = time.perf_counter()
+        if self.metrics is not None:
+            self.metrics.observe_stage(module, stage, now - start)
+        return now
+    
+    def _scale(self, module, scaler, features):
+        """scaler.transform, timed as the 'scaling' stage
+        
+        Only the sklearn fallback paths scale at predict time (the fused and
+        compiled artifacts fold it in), so 'scaling' is a sub-span of 'model'
+        - except for water, whose caller-supplied sequences are scaled while
+        building the features, within 'encoding'.
+        """
+        start = time.perf_counter()
+        features_scaled = scaler.transform(features)
+        self._observe(module, 'scaling', start)
+        return features_scaled
+    
+    def _predict_batch(self, module, records, read_row, predict, format_result,
+                       encode_row=None, to_features=None):
+        """Run one vectorized model call over a batch of records
+        
+        `read_row` validates a record and returns its raw values (categorical
+        fields still as labels); `encode_row` turns those into numeric codes
+        and `to_features` stacks the rows into the model input (default: a
+        float array). Rows that fail validation or encoding get an inline
+        error result so one bad row doesn't fail the whole batch. Each stage
+        (validation, encoding, model, serialization) is timed when `metrics`
+        is set.
+        """
+        results = [None] * len(records)
+        rows = []
+        indices = []
+        errors = 0
+        start = time.perf_counter()
+        for i, data in enumerate(records):
+            try:
+                rows.append(read_row(data))
+                indices.append(i)
+            except Exception as e:
+                results[i] = {'status': 'error', 'message': str(e)}
+                errors += 1
+        start = self._observe(module, 'validation', start)
+        
+        if encode_row is not None:
+            encoded, encoded_indices = [], []
+            for i, row in zip(indices, rows):
+                try:
+                    encoded.append(encode_row(row))
+                    encoded_indices.append(i)
+                except Exception as e:
+                    results[i] = {'status': 'error', 'message': str(e)}
+                    errors += 1
+            rows, indices = encoded, encoded_indices
+        
+        if indices:
+            try:
+                features = to_features(rows) if to_features is not None else np.array(rows, dtype=float)
+                start = self._observe(module, 'encoding', start)
+                predictions = predict(features)
+                start = self._observe(module, 'model', start)
+                for i, prediction in zip(indices, predictions):
+                    results[i] = format_result(prediction)
+                self._observe(module, 'serialization', start)
+            except Exception as e:
+                for i in indices:
+                    results[i] = {'status': 'error', 'message': str(e)}
+                errors += len(indices)
+        else:
+            self._observe(module, 'encoding', start)
+        if errors and self.metrics is not None:
+            self.metrics.count_errors(module, errors)
+        return results
+    
+    # Traffic
+    def _traffic_row(self, data):
+        return [
+            self._number(data, 'hour'),
+            self._number(data, 'day_of_week'),
+            self._number(data, 'month'),
+            self._number(data, 'temperature'),
+            self._field(data, 'weather')
+        ]
+    
+    def _traffic_encode(self, row):
+        return row[:4] + [self._encode(self.traffic_weather_lookup, row[4])]
+    
+    def _traffic_result(self, prediction):
+        # Determine congestion level
+        if prediction > TRAFFIC_HIGH_CONGESTION:
+            congestion = 'High'
+        elif prediction > TRAFFIC_MEDIUM_CONGESTION:
+            congestion = 'Medium'
+        else:
+            congestion = 'Low'
+        
+        return {
+            'predicted_vehicle_count': int(prediction),
+            'congestion_level': congestion,
+            'status': 'success'
+        }
+    
+    def _traffic_predict(self, features):
+        if self.traffic_forest is not None:
+            return forest_predict(self.traffic_forest, features)
+        return self.traffic_model.predict(features)
+    
+    def predict_traffic_batch(self, records):
+        """Predict traffic congestion for a batch of records"""
+        self._ensure_loaded('traffic')
+        return self._predict_batch('traffic', records, self._traffic_row,
+                                   self._traffic_predict, self._traffic_result,
+                                   encode_row=self._traffic_encode)
+    
     def predict_traffic(self, data):
         """Predict traffic congestion"""
-        try:
-            # Encode weather
-            weather_encoded = self.traffic_weather_encoder.transform([data['weather']])[0]
-            
-            # Prepare features
-            features = np.array([[
-                data['hour'],
-                data['day_of_week'],
-                data['month'],
-                data['temperature'],
-                weather_encoded
-            ]])
-            
-            # Predict
-            prediction = self.traffic_model.predict(features)[0]
-            
-            # Determine congestion level
-            if prediction > 700:
-                congestion = 'High'
-            elif prediction > 400:
-                congestion = 'Medium'
-            else:
-                congestion = 'Low'
-            
-            return {
-                'predicted_vehicle_count': int(prediction),
-                'congestion_level': congestion,
-                'status': 'success'
-            }
-        except Exception as e:
-            return {'status': 'error', 'message': str(e)}
+        return self.predict_traffic_batch([data])[0]
+    
+    # Energy
+    def _energy_row(self, data):
+        return [
+            self._number(data, 'hour'),
+            self._number(data, 'month'),
+            self._number(data, 'temperature'),
+            self._number(data, 'population_density')
+        ]
+    
+    def _energy_predict(self, features):
+        if self.energy_fused is not None:
+            return features @ self.energy_fused['coef'] + self.energy_fused['intercept']
+        features_scaled = self._scale('energy', self.energy_scaler, features)
+        return self.energy_model.predict(features_scaled)
+    
+    def _energy_result(self, prediction):
+        return {
+            'predicted_consumption_kwh': round(float(prediction), 2),
+            'status': 'success'
+        }
+    
+    def predict_energy_batch(self, records):
+        """Predict energy consumption for a batch of records"""
+        self._ensure_loaded('energy')
+        return self._predict_batch('energy', records, self._energy_row,
+                                   self._energy_predict, self._energy_result)
     
     def predict_energy(self, data):
         """Predict energy consumption"""
+        return self.predict_energy_batch([data])[0]
+    
+    # Water
+    def _water_data_path(self):
+        # Get the correct path to data directory
+        current_dir = os.path.dirname(os.path.abspath(__file__))
+        backend_dir = os.path.dirname(current_dir)
+        return os.path.join(backend_dir, 'data', 'water_data.csv')
+    
+    def _scale_water_sequence(self, sequence):
+        """Scale a (7, 5) water feature sequence the way the loaded model expects"""
+        if self.water_model_type == 'lstm':
+            return self.water_scaler_X.transform(sequence)
+        return self.water_scaler.transform(sequence)
+    
+    def _build_water_window(self, timestamps, sequence, signature):
+        return {
+            'signature': signature,
+            'timestamps': list(timestamps),
+            'sequence': sequence,
+            'scaled': self._scale_water_sequence(sequence)
+        }
+    
+    def _load_water_window(self):
+        """Read the most recent 7 days of water history from disk"""
+        data_path = self._water_data_path()
+        stat = os.stat(data_path)
+        
+        # Load historical data
+        return self._history_water_window(pd.read_csv(data_path), (stat.st_mtime_ns, stat.st_size))
+    
+    def _history_water_window(self, df, signature):
+        """Window of the most recent 7 days of a water history DataFrame"""
+        df['timestamp'] = pd.to_datetime(df['timestamp'])
+        df = df.sort_values('timestamp').tail(WATER_SEQUENCE_LENGTH)
+        if len(df) < WATER_SEQUENCE_LENGTH:
+            raise ValueError(f'Water history needs at least {WATER_SEQUENCE_LENGTH} days of data')
+        
+        return self._build_water_window(df['timestamp'], df[WATER_FEATURES].values.astype(float),
+                                        signature)
+    
+    def _latest_water_window(self):
+        """Return the cached 7-day input window, reloading it only when water_data.csv changes"""
+        stat = os.stat(self._water_data_path())
+        signature = (stat.st_mtime_ns, stat.st_size)
+        window = self._water_window
+        if window is None or window['signature'] != signature:
+            with self._water_window_lock:
+                window = self._water_window
+                if window is None or window['signature'] != signature:
+                    window = self._load_water_window()
+                    self._water_window = window
+        return window
+    
+    def append_water_reading(self, reading):
+        """Append a daily water reading to the history and roll the cached window forward
+        
+        The reading needs `timestamp`, `consumption_liters`, `temperature`,
+        `precipitation` and `population`; `day_of_week` and `month` default to
+        the timestamp's. The row is also appended to water_data.csv so the
+        window survives a restart.
+        """
+        self._ensure_loaded('water')
+        value = self._field(reading, 'timestamp')
         try:
-            # Prepare features
-            features = np.array([[
-                data['hour'],
-                data['month'],
-                data['temperature'],
-                data['population_density']
-            ]])
-            
-            # Scale and predict
-            features_scaled = self.energy_scaler.transform(features)
-            prediction = self.energy_model.predict(features_scaled)[0]
+            timestamp = pd.Timestamp(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid timestamp: {value!r}")
+        if pd.isna(timestamp):
+            raise ValueError(f"Invalid timestamp: {value!r}")
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.tz_convert(None)
+        row = {
+            'timestamp': timestamp.strftime('%Y-%m-%d'),
+            'day_of_week': self._calendar_field(reading, 'day_of_week', timestamp.dayofweek, 0, 6),
+            'month': self._calendar_field(reading, 'month', timestamp.month, 1, 12),
+            'consumption_liters': self._number(reading, 'consumption_liters'),
+            'temperature': self._number(reading, 'temperature'),
+            'precipitation': self._number(reading, 'precipitation'),
+            'population': self._number(reading, 'population')
+        }
+        
+        data_path = self._water_data_path()
+        with self._water_window_lock:
+            # Build the new window first so a reading that can't be used is
+            # never written (a retried request would otherwise append it twice)
+            window = self._water_window
+            if window is not None and timestamp >= window['timestamps'][-1]:
+                # Roll the window forward without re-reading the file
+                features = np.array([[row[f] for f in WATER_FEATURES]], dtype=float)
+                sequence = np.vstack([window['sequence'][1:], features])
+                timestamps = window['timestamps'][1:] + [timestamp]
+                window = self._build_water_window(timestamps, sequence, None)
+            else:
+                # Out-of-order reading (or no window yet): rebuild from the history
+                history = pd.concat([pd.read_csv(data_path), pd.DataFrame([row])], ignore_index=True)
+                window = None
+                if len(history) >= WATER_SEQUENCE_LENGTH:
+                    window = self._history_water_window(history, None)
             
-            return {
-                'predicted_consumption_kwh': round(float(prediction), 2),
-                'status': 'success'
-            }
+            with open(data_path, 'a', newline='') as f:
+                pd.DataFrame([row]).to_csv(f, header=False, index=False)
+            if window is not None:
+                stat = os.stat(data_path)
+                window['signature'] = (stat.st_mtime_ns, stat.st_size)
+            self._water_window = window
+        return row
+    
+    def _calendar_field(self, reading, name, default, low, high):
+        """Optional whole-number calendar field of a water reading, checked against its range"""
+        if name not in reading:
+            return int(default)
+        value = self._number(reading, name)
+        if value != int(value) or not low <= value <= high:
+            raise ValueError(f'{name} must be a whole number from {low} to {high}')
+        return int(value)
+    
+    def _water_sequence(self, data):
+        """The record's own 7-day `sequence` (unscaled), or None to use the cached latest window"""
+        if not isinstance(data, dict):
+            raise ValueError('Record must be a JSON object')
+        if 'sequence' not in data:
+            return None
+        
+        sequence = [
+            [self._number(day, f) for f in WATER_FEATURES] if isinstance(day, dict)
+            else [float(v) for v in day]
+            for day in data['sequence']
+        ]
+        sequence = np.array(sequence, dtype=float)
+        if sequence.shape != (WATER_SEQUENCE_LENGTH, len(WATER_FEATURES)):
+            raise ValueError(f'sequence must be {WATER_SEQUENCE_LENGTH} days of '
+                             f'{", ".join(WATER_FEATURES)}')
+        return sequence
+    
+    def _water_features(self, sequences, latest):
+        """Stack the batch's scaled sequences; supplied ones are scaled in one call"""
+        supplied = [i for i, sequence in enumerate(sequences) if sequence is not None]
+        features = np.empty((len(sequences), WATER_SEQUENCE_LENGTH, len(WATER_FEATURES)))
+        if len(supplied) < len(sequences):
+            features[:] = latest['scaled']
+        if supplied:
+            scaler = self.water_scaler_X if self.water_model_type == 'lstm' else self.water_scaler
+            stacked = np.concatenate([sequences[i] for i in supplied])
+            features[supplied] = self._scale('water', scaler, stacked).reshape(len(supplied), WATER_SEQUENCE_LENGTH, -1)
+        return features
+    
+    def _water_predict(self, sequences_scaled):
+        if self.water_model_type == 'lstm':
+            # LSTM model prediction
+            if self.water_engine == 'numpy':
+                prediction_scaled = lstm_forward(self.water_lstm_weights, sequences_scaled)
+            else:
+                prediction_scaled = self.water_model.predict(sequences_scaled, verbose=0)
+            return self.water_scaler_y.inverse_transform(prediction_scaled)[:, 0]
+        
+        # Linear Regression model prediction uses the latest day only
+        return self.water_model.predict(sequences_scaled[:, -1, :])
+    
+    def _water_result(self, prediction):
+        return {
+            'predicted_consumption_liters': round(float(prediction), 2),
+            'status': 'success'
+        }
+    
+    def predict_water_batch(self, records):
+        """Predict water consumption for a batch of records using LSTM or Linear Regression"""
+        self._ensure_loaded('water')
+        try:
+            latest = None
+            if any(not isinstance(r, dict) or 'sequence' not in r for r in records):
+                latest = self._latest_water_window()
         except Exception as e:
-            return {'status': 'error', 'message': str(e)}
+            return [{'status': 'error', 'message': str(e)} for _ in records]
+        
+        return self._predict_batch('water', records, self._water_sequence,
+                                   self._water_predict, self._water_result,
+                                   to_features=lambda sequences: self._water_features(sequences, latest))
     
     def predict_water(self, data):
         """Predict water consumption using LSTM or Linear Regression"""
-        try:
-            # Get the correct path to data directory
-            current_dir = os.path.dirname(os.path.abspath(__file__))
-            backend_dir = os.path.dirname(current_dir)
-            data_path = os.path.join(backend_dir, 'data', 'water_data.csv')
-            
-            # Load historical data
-            df = pd.read_csv(data_path)
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            df = df.sort_values('timestamp').tail(7)
-            
-            if hasattr(self, 'water_model_type') and self.water_model_type == 'lstm':
-                # LSTM model prediction
-                sequence = df[['day_of_week', 'month', 'temperature', 'precipitation', 'population']].values
-                sequence_reshaped = sequence.reshape(-1, sequence.shape[-1])
-                sequence_scaled = self.water_scaler_X.transform(sequence_reshaped)
-                sequence_scaled = sequence_scaled.reshape(1, 7, 5)
-                prediction_scaled = self.water_model.predict(sequence_scaled, verbose=0)
-                prediction = self.water_scaler_y.inverse_transform(prediction_scaled)[0][0]
-            else:
-                # Linear Regression model prediction
-                latest = df.iloc[-1]
-                features = np.array([[
-                    latest['day_of_week'],
-                    latest['month'],
-                    latest['temperature'],
-                    latest['precipitation'],
-                    latest['population']
-                ]])
-                features_scaled = self.water_scaler.transform(features)
-                prediction = self.water_model.predict(features_scaled)[0]
-            
-            return {
-                'predicted_consumption_liters': round(float(prediction), 2),
-                'status': 'success'
-            }
-        except Exception as e:
-            return {'status': 'error', 'message': str(e)}
+        return self.predict_water_batch([data])[0]
+    
+    # Waste
+    def _waste_row(self, data):
+        return [
+            self._number(data, 'day_of_week'),
+            self._field(data, 'location'),
+            self._field(data, 'waste_type')
+        ]
+    
+    def _waste_encode(self, row):
+        return [
+            row[0],
+            self._encode(self.waste_location_lookup, row[1]),
+            self._encode(self.waste_type_lookup, row[2])
+        ]
+    
+    def _waste_predict(self, features):
+        if self.waste_table is None:
+            return self._waste_knn_predict(features)
+        
+        # Exact lookup for every (day_of_week, location, waste_type) the table covers
+        day = features[:, 0]
+        in_table = (day == np.round(day)) & (day >= 0) & (day < self.waste_table.shape[0])
+        predictions = np.empty(len(features))
+        codes = features[in_table].astype(int)
+        predictions[in_table] = self.waste_table[codes[:, 0], codes[:, 1], codes[:, 2]]
+        if not in_table.all():
+            predictions[~in_table] = self._waste_knn_predict(features[~in_table])
+        return predictions
+    
+    def _waste_knn_predict(self, features):
+        self._load_waste_knn()
+        features_scaled = self._scale('waste', self.waste_scaler, features)
+        return self.waste_model.predict(features_scaled)
+    
+    def _waste_result(self, prediction):
+        # Clamp between 0 and 100
+        prediction = max(0, min(100, prediction))
+        collection_needed = 'Yes' if prediction > 80 else 'No'
+        
+        return {
+            'predicted_fill_level_percent': round(float(prediction), 2),
+            'collection_needed': collection_needed,
+            'status': 'success'
+        }
+    
+    def predict_waste_batch(self, records):
+        """Predict waste bin fill level for a batch of records"""
+        self._ensure_loaded('waste')
+        return self._predict_batch('waste', records, self._waste_row,
+                                   self._waste_predict, self._waste_result,
+                                   encode_row=self._waste_encode)
     
     def predict_waste(self, data):
         """Predict waste bin fill level"""
-        try:
-            # Encode categorical features
-            location_encoded = self.waste_location_encoder.transform([data['location']])[0]
-            waste_type_encoded = self.waste_type_encoder.transform([data['waste_type']])[0]
-            
-            # Prepare features
-            features = np.array([[
-                data['day_of_week'],
-                location_encoded,
-                waste_type_encoded
-            ]])
-            
-            # Scale and predict
-            features_scaled = self.waste_scaler.transform(features)
-            prediction = self.waste_model.predict(features_scaled)[0]
-            
-            # Clamp between 0 and 100
-            prediction = max(0, min(100, prediction))
-            collection_needed = 'Yes' if prediction > 80 else 'No'
-            
-            return {
-                'predicted_fill_level_percent': round(float(prediction), 2),
-                'collection_needed': collection_needed,
-                'status': 'success'
-            }
-        except Exception as e:
-            return {'status': 'error', 'message': str(e)}
+        return self.predict_waste_batch([data])[0]
+    
+    # Air quality
+    def _air_row(self, data):
+        return [self._number(data, f) for f in AIR_FEATURES]
+    
+    def _air_predict(self, features):
+        if self.air_quality_fused is not None:
+            decision = features @ self.air_quality_fused['coef'] + self.air_quality_fused['intercept']
+            return self.air_quality_fused['classes'][(decision > 0).astype(int)]
+        features_scaled = self._scale('air', self.air_quality_scaler, features)
+        return self.air_quality_model.predict(features_scaled)
+    
+    def _air_result(self, prediction):
+        quality = 'Good/Moderate' if prediction == 1 else 'Unhealthy'
+        
+        return {
+            'predicted_quality': quality,
+            'quality_binary': int(prediction),
+            'status': 'success'
+        }
+    
+    def predict_air_quality_batch(self, records):
+        """Predict air quality for a batch of records"""
+        self._ensure_loaded('air')
+        return self._predict_batch('air', records, self._air_row,
+                                   self._air_predict, self._air_result)
     
     def predict_air_quality(self, data):
         """Predict air quality"""
+        return self.predict_air_quality_batch([data])[0]
+    
+    # Forecasts
+    def _profile(self, data, name, length, period=None, default=None):
+        """Expand a profile field to `length` values
+        
+        Accepts a single value (held constant), a list of `length` values or,
+        with `period`, a list of `period` values repeated (e.g. 24 hourly
+        temperatures describing a typical day).
+        """
+        value = data.get(name, default) if isinstance(data, dict) else default
+        if value is None:
+            raise ValueError(f'Missing required field: {name}')
+        if not isinstance(value, list):
+            return np.full(length, value, dtype=object)
+        if len(value) == length:
+            return np.array(value, dtype=object)
+        if period and len(value) == period:
+            return np.resize(np.array(value, dtype=object), length)
+        expected = f'{length}' + (f' or {period}' if period else '')
+        raise ValueError(f'{name} must be a single value or a list of {expected} values')
+    
+    def _numeric_profile(self, data, name, length, period=None, default=None):
         try:
-            # Prepare features
-            features = np.array([[
-                data['month'],
-                data['day_of_week'],
-                data['temperature'],
-                data['wind_speed'],
-                data['pm25'],
-                data['pm10'],
-                data['no2'],
-                data['co']
-            ]])
-            
-            # Scale and predict
-            features_scaled = self.air_quality_scaler.transform(features)
-            prediction = self.air_quality_model.predict(features_scaled)[0]
-            
-            quality = 'Good/Moderate' if prediction == 1 else 'Unhealthy'
-            
-            return {
-                'predicted_quality': quality,
-                'quality_binary': int(prediction),
-                'status': 'success'
-            }
-        except Exception as e:
-            return {'status': 'error', 'message': str(e)}
-
+            values = self._profile(data, name, length, period, default).astype(float)
+        except (TypeError, ValueError) as e:
+            if str(e).startswith(('Missing', name)):
+                raise
+            raise ValueError(f'{name} must be numeric')
+        if not np.isfinite(values).all():
+            raise ValueError(f'{name} must be finite numbers')
+        return values
+    
+    def _forecast_length(self, data, name, default, maximum):
+        """Whole-number forecast length `name` (missing or null: `default`), from 1 to `maximum`"""
+        value = data.get(name)
+        if value is None:
+            return default
+        try:
+            length = int(value)
+        except (TypeError, ValueError):
+            raise ValueError(f'{name} must be a whole number')
+        if not 1 <= length <= maximum:
+            raise ValueError(f'{name} must be between 1 and {maximum}')
+        return length
+    
+    def _forecast_hours(self, data):
+        """Hourly timestamps of a forecast from `start` (default: the current hour) for `hours`"""
+        if not isinstance(data, dict):
+            raise ValueError('Request body must be a JSON object')
+        hours = self._forecast_length(data, 'hours', 168, FORECAST_MAX_HOURS)
+        try:
+            start = pd.Timestamp(data['start']) if data.get('start') else pd.Timestamp.now()
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid start: {data['start']!r}")
+        if pd.isna(start):
+            raise ValueError(f"Invalid start: {data['start']!r}")
+        if start.tzinfo is not None:
+            start = start.tz_convert(None)
+        return pd.DatetimeIndex(start.floor('h') + pd.to_timedelta(np.arange(hours), unit='h'))
+    
+    def forecast_energy(self, data):
+        """Hourly energy consumption for `hours` from `start`, in one model call
+        
+        `temperature` and `population_density` are a constant, a 24-hour daily
+        profile or one value per forecast hour.
+        """
+        self._ensure_loaded('energy')
+        times = self._forecast_hours(data)
+        hours = len(times)
+        features = np.column_stack([
+            times.hour,
+            times.month,
+            self._numeric_profile(data, 'temperature', hours, period=24),
+            self._numeric_profile(data, 'population_density', hours, period=24)
+        ]).astype(float)
+        predictions = np.round(self._energy_predict(features).astype(float), 2)
+        peak = int(np.argmax(predictions))
+        return {
+            'timestamps': [t.isoformat() for t in times],
+            'predicted_consumption_kwh': predictions.tolist(),
+            'total_kwh': round(float(predictions.sum()), 2),
+            'peak': {'timestamp': times[peak].isoformat(), 'consumption_kwh': float(predictions[peak])},
+            'status': 'success'
+        }
+    
+    def forecast_traffic(self, data):
+        """Hourly vehicle counts and congestion for `hours` from `start`, in one model call
+        
+        `temperature` and `weather` are a constant, a 24-hour daily profile or
+        one value per forecast hour.
+        """
+        self._ensure_loaded('traffic')
+        times = self._forecast_hours(data)
+        hours = len(times)
+        weather = self._profile(data, 'weather', hours, period=24)
+        labels, inverse = np.unique(weather.astype(str), return_inverse=True)
+        codes = np.array([self._encode(self.traffic_weather_lookup, str(label)) for label in labels])
+        features = np.column_stack([
+            times.hour,
+            times.dayofweek,
+            times.month,
+            self._numeric_profile(data, 'temperature', hours, period=24),
+            codes[inverse.ravel()]
+        ]).astype(float)
+        counts = self._traffic_predict(features).astype(int)
+        congestion = np.select(
+            [counts > TRAFFIC_HIGH_CONGESTION, counts > TRAFFIC_MEDIUM_CONGESTION],
+            ['High', 'Medium'], default='Low'
+        )
+        peak = int(np.argmax(counts))
+        return {
+            'timestamps': [t.isoformat() for t in times],
+            'predicted_vehicle_count': counts.tolist(),
+            'congestion_level': congestion.tolist(),
+            'high_congestion_hours': int((congestion == 'High').sum()),
+            'peak': {'timestamp': times[peak].isoformat(), 'vehicle_count': int(counts[peak])},
+            'status': 'success'
+        }
+    
+    def forecast_water(self, data):
+        """Daily water consumption for the `days` after the latest reading
+        
+        The 7-day input window is rolled forward one day at a time over the
+        forecast days. `temperature`, `precipitation` and `population` give
+        each forecast day's conditions (a constant or one value per day) and
+        default to the latest reading's. Consumption is not a model input, so
+        all the rolled windows are known up front and go through the model
+        as one batch.
+        """
+        self._ensure_loaded('water')
+        if not isinstance(data, dict):
+            raise ValueError('Request body must be a JSON object')
+        days = self._forecast_length(data, 'days', 7, FORECAST_MAX_DAYS)
+        
+        window = self._latest_water_window()
+        history = window['sequence']
+        last_day = pd.Timestamp(window['timestamps'][-1]).normalize()
+        dates = pd.DatetimeIndex(last_day + pd.to_timedelta(np.arange(1, days + 1), unit='D'))
+        latest = dict(zip(WATER_FEATURES, history[-1]))
+        future = np.column_stack([
+            dates.dayofweek,
+            dates.month,
+            *[self._numeric_profile(data, f, days, default=latest[f])
+              for f in ('temperature', 'precipitation', 'population')]
+        ]).astype(float)
+        
+        # Day i is predicted from the 7 days before it: history plus forecast days 0..i-1
+        rows = np.vstack([history, future[:-1]])
+        scaled = self._scale_water_sequence(rows)
+        windows = np.lib.stride_tricks.sliding_window_view(scaled, WATER_SEQUENCE_LENGTH, axis=0)
+        windows = np.ascontiguousarray(windows.transpose(0, 2, 1))
+        predictions = np.round(self._water_predict(windows).astype(float), 2)
+        return {
+            'dates': [d.strftime('%Y-%m-%d') for d in dates],
+            'predicted_consumption_liters': predictions.tolist(),
+            'total_liters': round(float(predictions.sum()), 2),
+            'status': 'success'
+        }
+    
+    # Scenario sweeps
+    def _scenario_axis(self, name, spec):
+        """Values of one grid axis: a list, or {start, stop, step} (stop inclusive) or {start, stop, num}"""
+        if isinstance(spec, list):
+            values = spec
+        elif isinstance(spec, dict) and 'start' in spec and 'stop' in spec:
+            try:
+                start, stop = float(spec['start']), float(spec['stop'])
+            except (TypeError, ValueError):
+                raise ValueError(f'{name}: start and stop must be numbers')
+            if 'num' in spec:
+                try:
+                    num = int(spec['num'])
+                except (TypeError, ValueError):
+                    raise ValueError(f'{name}: num must be a whole number')
+                if not 1 <= num <= SCENARIO_MAX_AXIS:
+                    raise ValueError(f'{name}: num must be 1 to {SCENARIO_MAX_AXIS}')
+                if not np.isfinite([start, stop]).all():
+                    raise ValueError(f'{name}: the range must be finite')
+                values = np.linspace(start, stop, num)
+            else:
+                try:
+                    step = float(spec.get('step', 1))
+                except (TypeError, ValueError):
+                    raise ValueError(f'{name}: step must be a number')
+                if step <= 0 or not np.isfinite([start, stop, step]).all():
+                    raise ValueError(f'{name}: step must be positive and the range finite')
+                span = (stop - start) / step
+                if not np.isfinite(span):
+                    # e.g. -1e308..1e308: the span itself overflows
+                    raise ValueError(f'{name}: at most {SCENARIO_MAX_AXIS} values per axis')
+                count = int(np.floor(span + 1e-9)) + 1
+                if count > SCENARIO_MAX_AXIS:
+                    raise ValueError(f'{name}: at most {SCENARIO_MAX_AXIS} values per axis')
+                values = start + step * np.arange(max(count, 0))
+            values = np.round(values, 6).tolist()
+        else:
+            raise ValueError(f'{name}: expected a list of values or {{"start", "stop", "step"|"num"}}')
+        if not 1 <= len(values) <= SCENARIO_MAX_AXIS:
+            raise ValueError(f'{name}: expected 1 to {SCENARIO_MAX_AXIS} values')
+        return values
+    
+    def _scenario_column(self, module, name, values):
+        """Encode the values of one input as a float column"""
+        lookup_name = SCENARIO_CATEGORIES.get(module, {}).get(name)
+        if lookup_name:
+            lookup = getattr(self, lookup_name)
+            return np.array([self._encode(lookup, value) for value in values], dtype=float)
+        try:
+            column = np.array(values, dtype=float)
+        except (TypeError, ValueError):
+            raise ValueError(f'{name} values must be numeric')
+        if not np.isfinite(column).all():
+            raise ValueError(f'{name} values must be finite numbers')
+        return column
+    
+    def scenario_plan(self, module, data):
+        """Validate a what-if grid request and describe the grid
+        
+        `data['grid']` maps inputs to the values to sweep (axes in the given
+        order); every other input of the module is held at `data['fixed'][name]`.
+        """
+        if module not in SCENARIO_FEATURES:
+            raise ValueError(f'Scenario sweeps support {", ".join(SCENARIO_FEATURES)}')
+        if not isinstance(data, dict) or not isinstance(data.get('grid'), dict) or not data['grid']:
+            raise ValueError('Request needs a "grid" object of input -> values')
+        self._ensure_loaded(module)
+        features = SCENARIO_FEATURES[module]
+        grid = data['grid']
+        fixed = data.get('fixed') or {}
+        unknown = [name for name in list(grid) + list(fixed) if name not in features]
+        if unknown:
+            raise ValueError(f'Unknown {module} inputs: {", ".join(unknown)}')
+        
+        axes = []
+        for name, spec in grid.items():
+            values = self._scenario_axis(name, spec)
+            axes.append({'name': name, 'values': values,
+                         'column': self._scenario_column(module, name, values)})
+        constants = {}
+        for name in features:
+            if name not in grid:
+                if name not in fixed:
+                    raise ValueError(f'{name} needs a grid axis or a fixed value')
+                constants[name] = self._scenario_column(module, name, [fixed[name]])[0]
+        
+        shape = tuple(len(axis['values']) for axis in axes)
+        return {
+            'module': module,
+            'features': features,
+            'axes': axes,
+            'constants': constants,
+            'shape': shape,
+            'cells': math.prod(shape),
+            'output': SCENARIO_OUTPUTS[module]
+        }
+    
+    def _scenario_values(self, module, features):
+        if module == 'traffic':
+            return self._traffic_predict(features).astype(int).astype(float)
+        if module == 'energy':
+            return np.round(self._energy_predict(features), 2)
+        if module == 'waste':
+            return np.round(np.clip(self._waste_predict(features), 0, 100), 2)
+        return self._air_predict(features).astype(float)
+    
+    def scenario_chunks(self, plan, chunk_size=65536):
+        """Evaluate the grid's Cartesian product in row-major order, `chunk_size` cells per model call
+        
+        Yields (offset, values) so memory stays bounded by the chunk, not the grid.
+        """
+        features = plan['features']
+        positions = {name: i for i, name in enumerate(features)}
+        for offset in range(0, plan['cells'], chunk_size):
+            cells = np.arange(offset, min(offset + chunk_size, plan['cells']))
+            index = np.unravel_index(cells, plan['shape'])
+            matrix = np.empty((len(cells), len(features)))
+            for name, value in plan['constants'].items():
+                matrix[:, positions[name]] = value
+            for axis, axis_index in zip(plan['axes'], index):
+                matrix[:, positions[axis['name']]] = axis['column'][axis_index]
+            yield offset, self._scenario_values(plan['module'], matrix)
+    
+    def scenario_matrix(self, plan, chunk_size=65536):
+        """The whole grid as a nested list with one dimension per axis"""
+        values = np.concatenate([values for _, values in self.scenario_chunks(plan, chunk_size)])
+        return values.reshape(plan['shape']).tolist()
@@ -0,0 +1,134 @@
+"""
+Micro-batching Inference Scheduler
+
+Coalesces concurrent single-row prediction requests for the same module into
+one batched ModelPredictor call and fans the results back out to the waiting
+requests.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from models.predict import BATCH_METHODS
+
+# Batch size histogram buckets (upper bounds)
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256]
+
+
+class _ModuleQueue:
+    """Pending requests and batching counters for one module"""
+
+    def __init__(self, module, window_ms, max_batch):
+        self.module = module
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.pending = queue.Queue()
+        self.worker = None
+        self.batches = 0
+        self.rows = 0
+        self.largest_batch = 0
+        self.histogram = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+
+    def record_batch(self, size):
+        self.batches += 1
+        self.rows += size
+        self.largest_batch = max(self.largest_batch, size)
+        for i, bound in enumerate(BATCH_SIZE_BUCKETS):
+            if size <= bound:
+                self.histogram[i] += 1
+                break
+        else:
+            self.histogram[-1] += 1
+
+    def stats(self):
+        return {
+            'window_ms': self.window * 1000.0,
+            'max_batch': self.max_batch,
+            'batches': self.batches,
+            'rows': self.rows,
+            'avg_batch_size': round(self.rows / self.batches, 2) if self.batches else 0,
+            'largest_batch': self.largest_batch,
+            'queued': self.pending.qsize(),
+            'batch_size_histogram': {
+                **{f'<={bound}': count for bound, count in zip(BATCH_SIZE_BUCKETS, self.histogram)},
+                f'>{BATCH_SIZE_BUCKETS[-1]}': self.histogram[-1]
+            }
+        }
+
+
+class InferenceScheduler:
+    """Queue single-row requests per module and run them as batches
+
+    A batch closes when `max_batch` rows are queued or `window_ms` has passed
+    since its first row arrived, whichever comes first. `overrides` maps a
+    module to {'window_ms': ..., 'max_batch': ...} to tune it separately.
+    Worker threads start on first use, so the scheduler is safe to create
+    before gunicorn forks.
+    """
+
+    def __init__(self, predictor, window_ms=2.0, max_batch=64, overrides=None):
+        self.predictor = predictor
+        overrides = overrides or {}
+        self._queues = {}
+        for module in BATCH_METHODS:
+            config = overrides.get(module, {})
+            self._queues[module] = _ModuleQueue(
+                module,
+                config.get('window_ms', window_ms),
+                config.get('max_batch', max_batch)
+            )
+        self._start_lock = threading.Lock()
+
+    def submit(self, module, record, timeout=None):
+        """Queue one record and block until its result is ready"""
+        module_queue = self._queues[module]
+        self._ensure_worker(module_queue)
+        future = Future()
+        module_queue.pending.put((record, future))
+        return future.result(timeout)
+
+    def _ensure_worker(self, module_queue):
+        if module_queue.worker is not None and module_queue.worker.is_alive():
+            return
+        with self._start_lock:
+            if module_queue.worker is None or not module_queue.worker.is_alive():
+                module_queue.worker = threading.Thread(
+                    target=self._run, args=(module_queue,),
+                    name=f'inference-{module_queue.module}', daemon=True
+                )
+                module_queue.worker.start()
+
+    def _collect(self, module_queue):
+        """Block for the first request, then gather more until the window closes or the batch is full"""
+        batch = [module_queue.pending.get()]
+        deadline = time.monotonic() + module_queue.window
+        while len(batch) < module_queue.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    batch.append(module_queue.pending.get_nowait())
+                else:
+                    batch.append(module_queue.pending.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self, module_queue):
+        method = getattr(self.predictor, BATCH_METHODS[module_queue.module])
+        while True:
+            batch = self._collect(module_queue)
+            module_queue.record_batch(len(batch))
+            try:
+                results = method([record for record, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def stats(self):
+        """Achieved batch sizes per module"""
+        return {module: module_queue.stats() for module, module_queue in self._queues.items()}
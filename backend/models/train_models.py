@@ -66,8 +66,75 @@ def train_traffic_model():
     joblib.dump(model, os.path.join(current_dir, 'traffic_model.pkl'))
     joblib.dump(le_weather, os.path.join(current_dir, 'traffic_weather_encoder.pkl'))
     print("  Model saved successfully")
+    compile_traffic_forest(model, X_test.values)
     return model
 
+def compile_traffic_forest(model=None, X_check=None):
+    """Flatten the traffic RandomForest into contiguous node arrays (traffic_forest/*.npy)
+    
+    All trees share one global node numbering and `children` interleaves each
+    node's left and right child. Leaves get feature 0, an infinite threshold
+    and children pointing at themselves, so the evaluator
+    can walk every tree a fixed `max_depth` steps without branching. The
+    compiled forest is checked against sklearn's predict before saving. One
+    .npy file per array lets the workers memory-map and share them.
+    """
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    if model is None:
+        model = joblib.load(os.path.join(current_dir, 'traffic_model.pkl'))
+    
+    features, thresholds, children, values, roots = [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        nodes = np.arange(tree.node_count)
+        is_leaf = tree.children_left == -1
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+        left = np.where(is_leaf, nodes, tree.children_left) + offset
+        right = np.where(is_leaf, nodes, tree.children_right) + offset
+        children.append(np.column_stack([left, right]).ravel())
+        values.append(tree.value[:, 0, 0])
+        roots.append(offset)
+        offset += tree.node_count
+        max_depth = max(max_depth, tree.max_depth)
+    
+    forest = {
+        'feature': np.concatenate(features).astype(np.int32),
+        'threshold': np.concatenate(thresholds).astype(np.float64),
+        'children': np.concatenate(children).astype(np.int32),
+        'value': np.concatenate(values).astype(np.float64),
+        'roots': np.array(roots, dtype=np.int32),
+        'max_depth': np.array(max_depth)
+    }
+    
+    # Parity check against sklearn
+    try:
+        from models.predict import SOURCE_DIGEST_KEY, forest_predict, save_array_dir, source_digest
+    except ImportError:
+        from predict import SOURCE_DIGEST_KEY, forest_predict, save_array_dir, source_digest
+    if X_check is None:
+        rng = np.random.RandomState(42)
+        X_check = np.column_stack([
+            rng.randint(0, 24, 1000), rng.randint(0, 7, 1000), rng.randint(1, 13, 1000),
+            rng.normal(25, 5, 1000), rng.randint(0, 3, 1000)
+        ])
+    X_check = np.asarray(X_check, dtype=np.float64)
+    max_diff = np.max(np.abs(forest_predict(forest, X_check) - model.predict(X_check)))
+    if max_diff > 1e-6:
+        raise ValueError(f"Compiled forest differs from sklearn by {max_diff:.2e}")
+    
+    # Serving only uses the compiled forest while traffic_model.pkl is unchanged
+    forest[SOURCE_DIGEST_KEY] = np.array(source_digest(current_dir, 'traffic_forest'))
+    save_array_dir(os.path.join(current_dir, 'traffic_forest'), forest)
+    # Drop the older single-file format so it can't shadow a stale forest
+    legacy_path = os.path.join(current_dir, 'traffic_forest.npz')
+    if os.path.exists(legacy_path):
+        os.remove(legacy_path)
+    print(f"  Compiled forest: {offset} nodes, depth {max_depth} (max diff vs sklearn: {max_diff:.2e})")
+    return forest
+
 def train_energy_model():
     """Train Linear Regression model for energy prediction"""
     print("Training Energy Model (Linear Regression)...")
@@ -108,6 +175,7 @@ def train_energy_model():
     joblib.dump(model, os.path.join(current_dir, 'energy_model.pkl'))
     joblib.dump(scaler, os.path.join(current_dir, 'energy_scaler.pkl'))
     print("  Model saved successfully")
+    export_fused_linear_model('energy', model, scaler)
     return model
 
 def train_water_model():
@@ -190,8 +258,58 @@ def train_water_model():
     joblib.dump(scaler_X, os.path.join(current_dir, 'water_scaler_X.pkl'))
     joblib.dump(scaler_y, os.path.join(current_dir, 'water_scaler_y.pkl'))
     print("  Model saved successfully")
+    export_water_lstm_weights(model)
     return model
 
+def export_water_lstm_weights(model=None):
+    """Export the water LSTM weights to water_lstm.npz for TensorFlow-free serving
+    
+    The exported forward pass is checked against Keras on random sequences.
+    """
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    if model is None:
+        from tensorflow.keras.models import load_model
+        model = load_model(os.path.join(current_dir, 'water_model.h5'), compile=False)
+    
+    weights = {}
+    n_lstm = 0
+    for layer in model.layers:
+        kind = type(layer).__name__
+        config = layer.get_config()
+        if kind == 'LSTM':
+            kernel, recurrent_kernel, bias = layer.get_weights()
+            weights[f'lstm{n_lstm}_kernel'] = kernel
+            weights[f'lstm{n_lstm}_recurrent_kernel'] = recurrent_kernel
+            weights[f'lstm{n_lstm}_bias'] = bias
+            weights[f'lstm{n_lstm}_activation'] = np.array(config['activation'])
+            weights[f'lstm{n_lstm}_recurrent_activation'] = np.array(config['recurrent_activation'])
+            n_lstm += 1
+        elif kind == 'Dense':
+            kernel, bias = layer.get_weights()
+            weights['dense_kernel'] = kernel
+            weights['dense_bias'] = bias
+            weights['dense_activation'] = np.array(config['activation'])
+        elif kind != 'Dropout':
+            raise ValueError(f"Unsupported layer for NumPy export: {kind}")
+    weights['n_lstm'] = np.array(n_lstm)
+    
+    # Parity check against Keras
+    try:
+        from models.predict import SOURCE_DIGEST_KEY, lstm_forward, source_digest
+    except ImportError:
+        from predict import SOURCE_DIGEST_KEY, lstm_forward, source_digest
+    _, timesteps, n_features = model.input_shape
+    sample = np.random.RandomState(42).normal(size=(64, timesteps, n_features)).astype(np.float32)
+    max_diff = np.max(np.abs(lstm_forward(weights, sample) - model.predict(sample, verbose=0)))
+    if max_diff > 1e-4:
+        raise ValueError(f"NumPy LSTM differs from Keras by {max_diff:.2e}")
+    
+    # Serving only uses the export while water_model.h5 is unchanged
+    weights[SOURCE_DIGEST_KEY] = np.array(source_digest(current_dir, 'water_lstm.npz'))
+    np.savez(os.path.join(current_dir, 'water_lstm.npz'), **weights)
+    print(f"  Exported NumPy LSTM weights (max diff vs Keras: {max_diff:.2e})")
+    return weights
+
 def train_waste_model():
     """Train KNN model for waste prediction"""
     print("Training Waste Model (KNN)...")
@@ -239,8 +357,47 @@ def train_waste_model():
     joblib.dump(le_location, os.path.join(current_dir, 'waste_location_encoder.pkl'))
     joblib.dump(le_waste_type, os.path.join(current_dir, 'waste_type_encoder.pkl'))
     print("  Model saved successfully")
+    export_waste_lookup_table(model, scaler, le_location, le_waste_type)
     return model
 
+def export_waste_lookup_table(model=None, scaler=None, le_location=None, le_waste_type=None):
+    """Precompute the waste KNN output for every input it can see (waste_lookup.npz)
+    
+    The model only takes day_of_week (7 values), location and waste_type, so
+    the full result table is 7 x 4 x 3 = 84 entries. The encoder vocabularies
+    and a digest of the model/scaler pickles are stored alongside so serving
+    can tell when the table is stale.
+    """
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    if model is None:
+        model = joblib.load(os.path.join(current_dir, 'waste_model.pkl'))
+    if scaler is None:
+        scaler = joblib.load(os.path.join(current_dir, 'waste_scaler.pkl'))
+    if le_location is None:
+        le_location = joblib.load(os.path.join(current_dir, 'waste_location_encoder.pkl'))
+    if le_waste_type is None:
+        le_waste_type = joblib.load(os.path.join(current_dir, 'waste_type_encoder.pkl'))
+    
+    days = np.arange(7)
+    locations = np.arange(len(le_location.classes_))
+    waste_types = np.arange(len(le_waste_type.classes_))
+    grid = np.array(np.meshgrid(days, locations, waste_types, indexing='ij')).reshape(3, -1).T
+    predictions = model.predict(scaler.transform(grid.astype(float)))
+    table = predictions.reshape(len(days), len(locations), len(waste_types))
+    
+    # Serving only uses the table while the model and scaler pickles are unchanged
+    try:
+        from models.predict import SOURCE_DIGEST_KEY, source_digest
+    except ImportError:
+        from predict import SOURCE_DIGEST_KEY, source_digest
+    np.savez(os.path.join(current_dir, 'waste_lookup.npz'),
+             table=table,
+             **{SOURCE_DIGEST_KEY: np.array(source_digest(current_dir, 'waste_lookup.npz'))},
+             locations=np.asarray(le_location.classes_, dtype=str),
+             waste_types=np.asarray(le_waste_type.classes_, dtype=str))
+    print(f"  Exported waste lookup table ({table.size} entries)")
+    return table
+
 def train_air_quality_model():
     """Train Logistic Regression model for air quality classification"""
     print("Training Air Quality Model (Logistic Regression)...")
@@ -283,8 +440,60 @@ def train_air_quality_model():
     joblib.dump(model, os.path.join(current_dir, 'air_quality_model.pkl'))
     joblib.dump(scaler, os.path.join(current_dir, 'air_quality_scaler.pkl'))
     print("  Model saved successfully")
+    export_fused_linear_model('air_quality', model, scaler)
     return model
 
+def export_fused_linear_model(name, model=None, scaler=None):
+    """Fold a StandardScaler into a linear model and save <name>_fused.npz
+    
+    ((x - mean) / scale) @ coef + b  ==  x @ (coef / scale) + (b - (mean / scale) @ coef),
+    so serving needs one dot product instead of two sklearn calls. Works for
+    the energy LinearRegression and the binary air quality LogisticRegression
+    (whose label is classes[decision > 0]).
+    """
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    if model is None:
+        model = joblib.load(os.path.join(current_dir, f'{name}_model.pkl'))
+    if scaler is None:
+        scaler = joblib.load(os.path.join(current_dir, f'{name}_scaler.pkl'))
+    
+    coef = np.asarray(model.coef_, dtype=np.float64)
+    intercept = np.asarray(model.intercept_, dtype=np.float64).ravel()
+    if coef.ndim > 1:
+        if coef.shape[0] != 1:
+            raise ValueError(f"Only single-output linear models can be fused, got coef shape {coef.shape}")
+        coef = coef[0]
+    mean = scaler.mean_ if scaler.mean_ is not None else np.zeros_like(coef)
+    scale = scaler.scale_ if scaler.scale_ is not None else np.ones_like(coef)
+    
+    fused = {
+        'coef': coef / scale,
+        'intercept': np.array(intercept[0] - np.dot(mean / scale, coef))
+    }
+    if hasattr(model, 'classes_'):
+        fused['classes'] = np.asarray(model.classes_)
+    
+    # Parity check against the scaler + model pipeline
+    sample = np.random.RandomState(42).normal(mean, scale, size=(1000, len(coef)))
+    if 'classes' in fused:
+        expected = model.decision_function(scaler.transform(sample))
+    else:
+        expected = model.predict(scaler.transform(sample))
+    actual = sample @ fused['coef'] + fused['intercept']
+    max_diff = np.max(np.abs(actual - expected) / np.maximum(1.0, np.abs(expected)))
+    if max_diff > 1e-9:
+        raise ValueError(f"Fused {name} model differs from sklearn by {max_diff:.2e}")
+    
+    # Serving only uses the fused model while the model and scaler pickles are unchanged
+    try:
+        from models.predict import SOURCE_DIGEST_KEY, source_digest
+    except ImportError:
+        from predict import SOURCE_DIGEST_KEY, source_digest
+    fused[SOURCE_DIGEST_KEY] = np.array(source_digest(current_dir, f'{name}_fused.npz'))
+    np.savez(os.path.join(current_dir, f'{name}_fused.npz'), **fused)
+    print(f"  Exported fused {name} model (max rel diff vs sklearn: {max_diff:.2e})")
+    return fused
+
 if __name__ == '__main__':
     print("=" * 50)
     print("Training ML Models for Smart City System")
@@ -0,0 +1,97 @@
+"""
+Exported model artifacts vs the models they were built from
+
+Serving prefers the exported artifacts (compiled traffic forest, NumPy LSTM
+weights, ...) over the original models. These tests check that the exports
+are actually picked up and still give the original models' answers.
+
+Run from the backend directory:
+    python -m pytest -q tests
+"""
+
+import os
+import sys
+
+import joblib
+import numpy as np
+import pytest
+
+# Add backend directory to path
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+
+from models.predict import (WATER_SEQUENCE_LENGTH, ModelPredictor, forest_predict,  # noqa: E402
+                            lstm_forward)
+
+MODELS_DIR = os.path.join(backend_dir, 'models')
+
+
+def model_file(filename):
+    path = os.path.join(MODELS_DIR, filename)
+    if not os.path.exists(path):
+        pytest.skip(f'{filename} not found; run setup.py first')
+    return path
+
+
+@pytest.fixture(scope='module')
+def predictor():
+    return ModelPredictor(lazy=True)
+
+
+def test_traffic_uses_compiled_forest(predictor):
+    model = joblib.load(model_file('traffic_model.pkl'))
+    predictor._ensure_loaded('traffic')
+    assert predictor.traffic_forest is not None, 'fell back to the pickled RandomForest'
+
+    rng = np.random.RandomState(0)
+    features = np.column_stack([
+        rng.randint(0, 24, 500), rng.randint(0, 7, 500), rng.randint(1, 13, 500),
+        rng.normal(25, 8, 500), rng.randint(0, 3, 500)
+    ]).astype(np.float64)
+    np.testing.assert_allclose(forest_predict(predictor.traffic_forest, features),
+                               model.predict(features), rtol=0, atol=1e-6)
+
+
+def test_water_uses_numpy_lstm(predictor):
+    h5_path = model_file('water_model.h5')
+    model_file('water_lstm.npz')
+    predictor._ensure_loaded('water')
+    assert predictor.water_engine == 'numpy', 'fell back to Keras'
+
+    keras_models = pytest.importorskip('tensorflow.keras.models')
+    model = keras_models.load_model(h5_path, compile=False)
+    n_features = model.input_shape[-1]
+    sample = np.random.RandomState(0).normal(size=(32, WATER_SEQUENCE_LENGTH, n_features)).astype(np.float32)
+    np.testing.assert_allclose(lstm_forward(predictor.water_lstm_weights, sample),
+                               model.predict(sample, verbose=0), rtol=0, atol=1e-4)
+
+
+@pytest.mark.parametrize('name, module', [('energy', 'energy'), ('air_quality', 'air')])
+def test_linear_models_use_fused_export(predictor, name, module):
+    model = joblib.load(model_file(f'{name}_model.pkl'))
+    scaler = joblib.load(model_file(f'{name}_scaler.pkl'))
+    model_file(f'{name}_fused.npz')
+    predictor._ensure_loaded(module)
+    fused = getattr(predictor, f'{name}_fused')
+    assert fused is not None, 'fell back to the pickled model and scaler'
+
+    sample = np.random.RandomState(0).normal(scaler.mean_, scaler.scale_, size=(500, len(scaler.mean_)))
+    actual = sample @ fused['coef'] + fused['intercept']
+    if 'classes' in fused:
+        expected = model.decision_function(scaler.transform(sample))
+    else:
+        expected = model.predict(scaler.transform(sample))
+    np.testing.assert_allclose(actual, expected, rtol=1e-9, atol=1e-9)
+
+
+def test_waste_uses_lookup_table(predictor):
+    model = joblib.load(model_file('waste_model.pkl'))
+    scaler = joblib.load(model_file('waste_scaler.pkl'))
+    model_file('waste_lookup.npz')
+    predictor._ensure_loaded('waste')
+    assert predictor.waste_table is not None, 'fell back to the live KNN model'
+
+    table = predictor.waste_table
+    grid = np.array(np.meshgrid(*[np.arange(n) for n in table.shape], indexing='ij')).reshape(3, -1).T
+    expected = model.predict(scaler.transform(grid.astype(float)))
+    np.testing.assert_allclose(table.reshape(-1), expected, rtol=0, atol=1e-9)
@@ -0,0 +1,210 @@
+"""
+Chart Rendering for PDF Reports
+
+Charts are described by small JSON-able specs (already aggregated, so a spec
+never grows with the number of stored predictions) and rendered to PNG with
+matplotlib's object-oriented Agg API, which keeps no global pyplot state.
+Rendering runs in a process pool so it neither holds the GIL of the worker
+serving requests nor serializes the per-module charts of one report, and the
+PNGs are cached by a hash of their spec so unchanged charts are not redrawn.
+"""
+
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+FIGURE_SIZE = (8, 5)  # inches; PNGs are FIGURE_SIZE * CHART_DPI pixels
+CHART_DPI = 100
+TREND_POINTS = 240  # trend lines are averaged down to at most this many points
+PRIMARY_COLOR = '#3498db'
+LEVEL_COLORS = {'Low': '#2ecc71', 'Medium': '#f39c12', 'High': '#e74c3c',
+                'Good/Moderate': '#2ecc71', 'Unhealthy': '#e74c3c'}
+# predicted_quality labels of the binary air quality model, in display order
+AIR_QUALITY_LEVELS = ('Good/Moderate', 'Unhealthy')
+
+# Store columns (result section) each module's charts are built from
+CHART_FIELDS = {
+    'traffic': ['status', 'congestion_level', 'predicted_vehicle_count'],
+    'energy': ['status', 'predicted_consumption_kwh'],
+    'water': ['status', 'predicted_consumption_liters'],
+    'waste': ['status', 'predicted_fill_level_percent'],
+    'air': ['status', 'predicted_quality']
+}
+
+
+def category_counts(labels, order=()):
+    """(labels, counts) of a label array (None = missing), known labels first in `order`"""
+    found = Counter(labels.tolist())
+    found.pop(None, None)
+    keys = [k for k in order if k in found] + sorted(k for k in found if k not in order)
+    return keys, [found[k] for k in keys]
+
+
+def _trend(values):
+    """Row positions and values of a series, averaged into at most TREND_POINTS buckets"""
+    values = values[~np.isnan(values)]
+    if len(values) <= TREND_POINTS:
+        return list(range(1, len(values) + 1)), [round(float(v), 4) for v in values]
+    bounds = np.linspace(0, len(values), TREND_POINTS + 1).astype(int)
+    means = np.add.reduceat(values, bounds[:-1]) / np.diff(bounds)
+    return bounds[1:].tolist(), [round(float(v), 4) for v in means]
+
+
+def _bar(title, labels, values, xlabel, ylabel='Predictions'):
+    return {'kind': 'bar', 'title': title, 'labels': labels, 'values': values,
+            'colors': [LEVEL_COLORS.get(label, PRIMARY_COLOR) for label in labels],
+            'xlabel': xlabel, 'ylabel': ylabel}
+
+
+def _line(title, x, values, ylabel):
+    return {'kind': 'line', 'title': title, 'x': x, 'values': values,
+            'xlabel': 'Prediction #', 'ylabel': ylabel}
+
+
+def chart_specs(module, columns):
+    """Chart specs for one module from its CHART_FIELDS columns (NumPy arrays, oldest first)"""
+    ok = columns['status'] == 'success'
+    if not ok.any():
+        return []
+    specs = []
+    if module == 'traffic':
+        labels, counts = category_counts(columns['congestion_level'][ok], ('Low', 'Medium', 'High'))
+        specs.append(_bar('Congestion Level Distribution', labels, counts, 'Congestion level'))
+        x, values = _trend(columns['predicted_vehicle_count'][ok])
+        specs.append(_line('Predicted Vehicle Count', x, values, 'Vehicles'))
+    elif module == 'energy':
+        x, values = _trend(columns['predicted_consumption_kwh'][ok])
+        specs.append(_line('Energy Consumption Trend', x, values, 'kWh'))
+    elif module == 'water':
+        x, values = _trend(columns['predicted_consumption_liters'][ok])
+        specs.append(_line('Water Consumption Trend', x, values, 'Liters'))
+    elif module == 'waste':
+        fill = columns['predicted_fill_level_percent'][ok]
+        counts, edges = np.histogram(fill[~np.isnan(fill)], bins=10, range=(0, 100))
+        labels = [f'{int(lo)}-{int(hi)}' for lo, hi in zip(edges[:-1], edges[1:])]
+        specs.append(_bar('Bin Fill Level Distribution', labels, counts.tolist(), 'Fill level (%)', 'Bins'))
+    elif module == 'air':
+        labels, counts = category_counts(columns['predicted_quality'][ok], AIR_QUALITY_LEVELS)
+        specs.append({'kind': 'pie', 'title': 'Air Quality Split', 'labels': labels, 'values': counts,
+                      'colors': [LEVEL_COLORS.get(label, PRIMARY_COLOR) for label in labels]})
+    return specs
+
+
+def render_chart(spec):
+    """Render one chart spec to PNG bytes (safe to call from any thread or process)"""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=FIGURE_SIZE, dpi=CHART_DPI, tight_layout=True)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    kind = spec['kind']
+    if kind == 'bar':
+        ax.bar(spec['labels'], spec['values'], color=spec.get('colors') or PRIMARY_COLOR)
+    elif kind == 'line':
+        ax.plot(spec.get('x', range(len(spec['values']))), spec['values'],
+                color=PRIMARY_COLOR, linewidth=1.5, marker='o' if len(spec['values']) <= 30 else None)
+    elif kind == 'pie':
+        ax.pie(spec['values'], labels=spec['labels'], colors=spec.get('colors'),
+               autopct='%1.1f%%', startangle=90)
+        ax.axis('equal')
+    else:
+        raise ValueError(f"Unknown chart kind: {kind}")
+
+    ax.set_title(spec.get('title', ''), fontsize=14, fontweight='bold', pad=20)
+    if kind != 'pie':
+        ax.set_xlabel(spec.get('xlabel', ''))
+        ax.set_ylabel(spec.get('ylabel', ''))
+        ax.grid(True, alpha=0.3)
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png')
+    return buffer.getvalue()
+
+
+def chart_key(spec):
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()
+
+
+class ChartRenderer:
+    """Renders chart specs in a process pool with an LRU cache of the PNGs
+
+    `max_workers=0` renders in the calling thread instead. The pool is
+    started on first use in each process, so a gunicorn master that preloads
+    the app never forks with a pool attached.
+    """
+
+    def __init__(self, max_workers=2, cache_size=64):
+        self.max_workers = max_workers
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                # Not 'fork': the pool is started from a request thread of a
+                # threaded server, and a forked child could inherit a lock
+                # (import, logging, allocator) held by another thread. The
+                # forkserver is started single-threaded with the chart code
+                # preloaded, so workers fork from it cheaply and safely
+                methods = multiprocessing.get_all_start_methods()
+                if 'forkserver' in methods:
+                    context = multiprocessing.get_context('forkserver')
+                    context.set_forkserver_preload(['utils.charts', 'matplotlib.backends.backend_agg'])
+                else:
+                    context = multiprocessing.get_context('spawn')
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+                self._pid = os.getpid()
+            return self._executor
+
+    def render(self, specs):
+        """PNG bytes for each spec, in order"""
+        keys = [chart_key(spec) for spec in specs]
+        images = {}
+        with self._lock:
+            for key in keys:
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    images[key] = self._cache[key]
+        missing = {key: spec for key, spec in zip(keys, specs) if key not in images}
+        if missing:
+            images.update(self._render_missing(missing))
+        with self._lock:
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+            for key in missing:
+                self._cache[key] = images[key]
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return [images[key] for key in keys]
+
+    def _render_missing(self, missing):
+        if self.max_workers > 0:
+            try:
+                pool = self._pool()
+                return dict(zip(missing, pool.map(render_chart, missing.values())))
+            except BrokenProcessPool as e:
+                print(f"[WARNING] Chart pool failed ({e}); rendering in-process")
+                with self._lock:
+                    self._executor = None
+        return {key: render_chart(spec) for key, spec in missing.items()}
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,109 @@
+"""
+Prometheus Metrics for the Smart City API
+
+Exposes /metrics in the Prometheus text format: request latency per endpoint,
+per-stage timings inside ModelPredictor, error counts, prediction store sizes
+and model load times. When PROMETHEUS_MULTIPROC_DIR is set (before the app
+starts) every gunicorn worker writes its samples there and /metrics
+aggregates all of them; see gunicorn.conf.py for the matching hooks.
+"""
+
+import os
+import time
+
+from flask import Response, g, request
+
+try:
+    from prometheus_client import (CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge,
+                                   Histogram, generate_latest, multiprocess)
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STAGE_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025,
+                 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0)
+
+if PROMETHEUS_AVAILABLE:
+    REQUEST_LATENCY = Histogram(
+        'smartcity_request_latency_seconds', 'HTTP request latency',
+        ['endpoint', 'method'], buckets=LATENCY_BUCKETS
+    )
+    REQUEST_ERRORS = Counter(
+        'smartcity_request_errors_total', 'HTTP responses with status >= 400',
+        ['endpoint', 'status']
+    )
+    PREDICTION_STAGE = Histogram(
+        'smartcity_prediction_stage_seconds', 'Time spent per ModelPredictor stage',
+        ['module', 'stage'], buckets=STAGE_BUCKETS
+    )
+    PREDICTION_ERRORS = Counter(
+        'smartcity_prediction_errors_total', 'Prediction rows that returned an error result',
+        ['module']
+    )
+    STORE_ROWS = Gauge(
+        'smartcity_prediction_store_rows', 'Predictions held in the in-memory store',
+        ['module'], multiprocess_mode='livesum'
+    )
+    MODEL_LOAD_SECONDS = Gauge(
+        'smartcity_model_load_seconds', 'Time taken to load each model',
+        ['model'], multiprocess_mode='liveall'
+    )
+
+
+class PredictorMetrics:
+    """Receives timings and error counts from ModelPredictor (its `metrics` attribute)"""
+
+    def observe_stage(self, module, stage, seconds):
+        PREDICTION_STAGE.labels(module, stage).observe(seconds)
+
+    def count_errors(self, module, count):
+        PREDICTION_ERRORS.labels(module).inc(count)
+
+    def model_loaded(self, name, seconds):
+        MODEL_LOAD_SECONDS.labels(name).set(seconds)
+
+
+def init_metrics(app, predictor=None, store=None):
+    """Register request hooks and the /metrics endpoint on the Flask app"""
+    if not PROMETHEUS_AVAILABLE:
+        @app.route('/metrics', methods=['GET'])
+        def metrics_unavailable():
+            return Response('prometheus_client is not installed\n', status=501, mimetype='text/plain')
+        return False
+
+    if predictor is not None:
+        predictor.metrics = PredictorMetrics()
+        for name, seconds in predictor.load_times.items():
+            predictor.metrics.model_loaded(name, seconds)
+
+    @app.before_request
+    def start_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return response
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        REQUEST_LATENCY.labels(endpoint, request.method).observe(time.perf_counter() - start)
+        if response.status_code >= 400:
+            REQUEST_ERRORS.labels(endpoint, str(response.status_code)).inc()
+        if store is not None and request.method == 'POST':
+            for module in store.modules:
+                STORE_ROWS.labels(module).set(store.count(module))
+        return response
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        if store is not None:
+            for module in store.modules:
+                STORE_ROWS.labels(module).set(store.count(module))
+        if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+            return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+        return Response(generate_latest(), mimetype=CONTENT_TYPE_LATEST)
+
+    return True
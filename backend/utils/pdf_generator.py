@@ -3,6 +3,7 @@ PDF Report Generator for Smart City Resource Optimization System
 """
 
 from reportlab.lib.pagesizes import letter, A4
+from reportlab import rl_config
 from reportlab.lib import colors
 from reportlab.lib.units import inch
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image, PageBreak
@@ -11,9 +12,21 @@ from reportlab.lib.enums import TA_CENTER, TA_LEFT
 from datetime import datetime
 import os
 import io
-from matplotlib import pyplot as plt
 import numpy as np
 
+from utils.charts import render_chart
+
+# Write binary PDF streams; the pure-Python ASCII85 encoder otherwise
+# dominates report build time once chart images are embedded
+rl_config.useA85 = 0
+
+# Default number of predictions listed per module in the "Recent Predictions" table
+RECENT_PREDICTIONS = 10
+
+# Size of a chart image on the page (keeps the 8x5 figure aspect ratio)
+CHART_WIDTH = 6*inch
+CHART_HEIGHT = 3.75*inch
+
 class PDFReportGenerator:
     def __init__(self):
         self.styles = getSampleStyleSheet()
@@ -49,32 +62,79 @@ class PDFReportGenerator:
     
     def create_chart_image(self, chart_data, chart_type='bar', title='Chart'):
         """Create a chart image for PDF"""
-        fig, ax = plt.subplots(figsize=(8, 5))
-        
-        if chart_type == 'bar':
-            ax.bar(chart_data['labels'], chart_data['values'], 
-                   color=chart_data.get('colors', ['#3498db'] * len(chart_data['labels'])))
-        elif chart_type == 'line':
-            ax.plot(chart_data['labels'], chart_data['values'], 
-                   marker='o', color='#3498db', linewidth=2)
-        elif chart_type == 'pie':
-            ax.pie(chart_data['values'], labels=chart_data['labels'], 
-                  autopct='%1.1f%%', startangle=90)
-        
-        ax.set_title(title, fontsize=14, fontweight='bold', pad=20)
-        ax.grid(True, alpha=0.3)
-        plt.tight_layout()
-        
-        # Save to bytes
-        img_buffer = io.BytesIO()
-        plt.savefig(img_buffer, format='png', dpi=100, bbox_inches='tight')
-        img_buffer.seek(0)
-        plt.close()
-        
-        return img_buffer
+        spec = {
+            'kind': chart_type,
+            'title': title,
+            'labels': list(chart_data['labels']),
+            'values': list(chart_data['values']),
+            'colors': chart_data.get('colors')
+        }
+        if chart_type == 'line':
+            spec['x'] = spec['labels']
+        return io.BytesIO(render_chart(spec))
+    
+    def summary_tables(self, summary):
+        """Flowables for a module's report_summary.module_summary()"""
+        flowables = [Paragraph("Summary", self.styles['Heading3'])]
+        rows = [
+            ['Predictions', str(summary['count'])],
+            ['Successful', str(summary['success'])],
+            ['Errors', str(summary['errors'])]
+        ]
+        value = summary.get('value')
+        if value:
+            label = value['field'].replace('predicted_', '').replace('_', ' ')
+            for key in ('min', 'p25', 'p50', 'p75', 'p95', 'max', 'mean'):
+                rows.append([f"{label} ({key})", f"{value[key]:,}"])
+        for category, count in summary.get('categories', {}).items():
+            rows.append([category, str(count)])
+        flowables.append(self._small_table([['Metric', 'Value']] + rows, [3*inch, 2*inch]))
+        
+        if summary.get('hourly'):
+            flowables.append(Spacer(1, 0.15*inch))
+            flowables.append(Paragraph("By Hour of Day", self.styles['Heading3']))
+            has_mean = 'mean' in summary['hourly'][0]
+            header = ['Hour', 'Predictions'] + (['Average'] if has_mean else [])
+            hourly = [header] + [
+                [f"{row['hour']:02d}:00", str(row['count'])] + ([f"{row['mean']:,}"] if has_mean else [])
+                for row in summary['hourly']
+            ]
+            flowables.append(self._small_table(hourly, [1.2*inch, 1.5*inch] + ([1.5*inch] if has_mean else [])))
+        flowables.append(Spacer(1, 0.2*inch))
+        return flowables
+    
+    def _small_table(self, data, col_widths):
+        table = Table(data, colWidths=col_widths)
+        table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#95a5a6')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 8),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
+        ]))
+        return table
     
-    def generate_report(self, stats, predictions, output_path):
-        """Generate complete PDF report"""
+    def generate_report(self, stats, predictions, output_path, charts=None, summaries=None,
+                        recent_limit=RECENT_PREDICTIONS):
+        """Generate complete PDF report
+        
+        `predictions` is a list of prediction dicts (each with a 'module' key)
+        or a dict of module -> list, oldest first; only the last
+        `recent_limit` of each module are listed. `charts` optionally maps
+        a module to a list of PNG images (bytes) and `summaries` a module to
+        its report_summary.module_summary(), both shown in that module's section.
+        """
+        charts = charts or {}
+        summaries = summaries or {}
+        if isinstance(predictions, dict):
+            by_module = predictions
+        else:
+            # Group in one pass rather than filtering the whole list per module
+            by_module = {}
+            for pred in predictions:
+                by_module.setdefault(pred.get('module'), []).append(pred)
         doc = SimpleDocTemplate(output_path, pagesize=A4)
         story = []
         
@@ -147,8 +207,8 @@ class PDFReportGenerator:
         }
         
         for module in modules:
-            module_preds = [p for p in predictions if p.get('module') == module]
-            if module_preds:
+            module_preds = by_module.get(module, [])
+            if module_preds or stats.get(module, {}).get('total'):
                 story.append(PageBreak())
                 story.append(Paragraph(module_names[module], self.heading_style))
                 
@@ -171,9 +231,17 @@ class PDFReportGenerator:
                 story.append(Paragraph(stats_text, self.normal_style))
                 story.append(Spacer(1, 0.2*inch))
                 
+                if module in summaries:
+                    story.extend(self.summary_tables(summaries[module]))
+                
+                # Charts
+                for png in charts.get(module, []):
+                    story.append(Image(io.BytesIO(png), width=CHART_WIDTH, height=CHART_HEIGHT))
+                    story.append(Spacer(1, 0.2*inch))
+                
                 # Recent predictions table
                 story.append(Paragraph("Recent Predictions", self.styles['Heading3']))
-                recent_preds = module_preds[:10]  # Last 10 predictions
+                recent_preds = module_preds[-recent_limit:] if recent_limit > 0 else []
                 
                 if recent_preds:
                     pred_data = [['Timestamp', 'Prediction Details']]
@@ -186,7 +254,7 @@ class PDFReportGenerator:
                             except:
                                 pass
                         
-                        pred_details = pred.get('prediction', {})
+                        pred_details = pred.get('result', pred.get('prediction', {}))
                         details_str = ", ".join([f"{k}: {v}" for k, v in pred_details.items() if k != 'status'])
                         
                         pred_data.append([timestamp[:16], details_str[:80]])
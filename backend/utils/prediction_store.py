@@ -0,0 +1,440 @@
+"""
+Bounded in-memory prediction store
+
+Keeps the most recent predictions per module in fixed-capacity ring buffers.
+Numeric inputs/outputs live in preallocated NumPy arrays and categorical
+fields (weather, location, congestion level, ...) as small integer codes, so
+memory stays flat no matter how long the worker runs.
+"""
+
+import base64
+import json
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import numpy as np
+
+# Column kinds:
+#   'int' / 'float'  numeric, stored as float64 (NaN = missing)
+#   'category'       int16 code into a per-column vocabulary (-1 = missing)
+#   'text'           free-form string (error messages), object array
+PREDICTION_SCHEMAS = {
+    'traffic': {
+        'input': {'hour': 'int', 'day_of_week': 'int', 'month': 'int',
+                  'temperature': 'float', 'weather': 'category'},
+        'result': {'predicted_vehicle_count': 'int', 'congestion_level': 'category',
+                   'status': 'category', 'message': 'text'}
+    },
+    'energy': {
+        'input': {'hour': 'int', 'month': 'int', 'temperature': 'float',
+                  'population_density': 'float'},
+        'result': {'predicted_consumption_kwh': 'float', 'status': 'category', 'message': 'text'}
+    },
+    'water': {
+        'input': {},
+        'result': {'predicted_consumption_liters': 'float', 'status': 'category', 'message': 'text'}
+    },
+    'waste': {
+        'input': {'day_of_week': 'int', 'location': 'category', 'waste_type': 'category'},
+        'result': {'predicted_fill_level_percent': 'float', 'collection_needed': 'category',
+                   'status': 'category', 'message': 'text'}
+    },
+    'air': {
+        'input': {'month': 'int', 'day_of_week': 'int', 'temperature': 'float',
+                  'wind_speed': 'float', 'pm25': 'float', 'pm10': 'float',
+                  'no2': 'float', 'co': 'float'},
+        'result': {'predicted_quality': 'category', 'quality_binary': 'int',
+                   'status': 'category', 'message': 'text'}
+    }
+}
+
+# Dashboard aggregates, maintained incrementally as rows are added and evicted:
+#   ('count', field, value)  retained rows whose result field equals value
+#   ('mean', field)          mean of the result field over successful rows
+STATS_SPECS = {
+    'traffic': {'high_congestion': ('count', 'congestion_level', 'High')},
+    'energy': {'avg_consumption': ('mean', 'predicted_consumption_kwh')},
+    'water': {'avg_consumption': ('mean', 'predicted_consumption_liters')},
+    'waste': {'collection_needed': ('count', 'collection_needed', 'Yes')},
+    'air': {'unhealthy_days': ('count', 'quality_binary', 0)}
+}
+
+# Categorical vocabularies are capped; anything beyond the cap is stored as OTHER
+MAX_CATEGORIES = 1024
+OTHER = '<other>'
+
+
+class _Column:
+    """One preallocated column of a module's ring buffer"""
+
+    def __init__(self, kind, capacity):
+        self.kind = kind
+        if kind == 'category':
+            self.data = np.full(capacity, -1, dtype=np.int16)
+            self.vocab = []
+            self.codes = {}
+        elif kind == 'text':
+            self.data = np.full(capacity, None, dtype=object)
+        else:
+            self.data = np.full(capacity, np.nan, dtype=np.float64)
+
+    def encode(self, value):
+        """Convert a raw JSON value into this column's storage representation"""
+        if value is None:
+            return -1 if self.kind == 'category' else (None if self.kind == 'text' else np.nan)
+        if self.kind == 'category':
+            value = str(value)
+            code = self.codes.get(value)
+            if code is None:
+                if len(self.vocab) >= MAX_CATEGORIES - 1 and value != OTHER:
+                    return self.encode(OTHER)
+                code = len(self.vocab)
+                self.vocab.append(value)
+                self.codes[value] = code
+            return code
+        if self.kind == 'text':
+            return str(value)
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return np.nan
+
+    def decode(self, stored):
+        """Convert a stored value back to JSON, or None if it was missing"""
+        if self.kind == 'category':
+            return self.vocab[stored] if stored >= 0 else None
+        if self.kind == 'text':
+            return stored
+        if np.isnan(stored):
+            return None
+        return int(stored) if self.kind == 'int' else float(stored)
+
+    def decode_array(self, stored):
+        """Vectorized decode; categories come back as an object array of labels"""
+        if self.kind == 'category':
+            labels = np.array(self.vocab + [None], dtype=object)
+            return labels[stored]
+        return stored
+
+
+def _accumulators(stats_spec):
+    """Expand a stats spec into (key, contribution function) pairs"""
+    accumulators = []
+    for name, spec in stats_spec.items():
+        if spec[0] == 'count':
+            _, field, value = spec
+            accumulators.append((name, lambda r, f=field, v=value: 1.0 if r.get(f) == v else 0.0))
+        elif spec[0] == 'mean':
+            field = spec[1]
+            accumulators.append((name + ':sum', lambda r, f=field: _success_value(r, f)))
+            accumulators.append((name + ':n', lambda r, f=field: 0.0 if np.isnan(_success_value(r, f)) else 1.0))
+        else:
+            raise ValueError(f'Unknown aggregate: {spec[0]}')
+    return accumulators
+
+
+def _success_value(result, field):
+    if result.get('status') != 'success':
+        return np.nan
+    try:
+        return float(result.get(field))
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class ModuleBuffer:
+    """Fixed-capacity ring buffer of one module's predictions
+
+    Row `seq` (0-based count of all rows ever appended) lives at slot
+    `seq % capacity`; the retained rows are seq in [appended - size, appended).
+    `version` increases on every change (append or expiry).
+
+    Each row's contribution to the stats aggregates is kept next to it, so the
+    running sums can be decremented when the row is evicted.
+    """
+
+    def __init__(self, schema, capacity, stats_spec=None):
+        self.capacity = capacity
+        self.size = 0
+        self.appended = 0
+        self.version = 0
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.columns = {
+            section: {name: _Column(kind, capacity) for name, kind in fields.items()}
+            for section, fields in schema.items()
+        }
+        self.stats_spec = stats_spec or {}
+        self._accumulators = _accumulators(self.stats_spec)
+        self._contributions = {key: np.zeros(capacity, dtype=np.float64) for key, _ in self._accumulators}
+        self._sums = {key: 0.0 for key, _ in self._accumulators}
+
+    def _evict(self, slot):
+        for key, contributions in self._contributions.items():
+            self._sums[key] -= contributions[slot]
+
+    def append(self, timestamp, sections):
+        slot = self.appended % self.capacity
+        if self.size == self.capacity:
+            self._evict(slot)
+        
+        result = sections.get('result')
+        if not isinstance(result, dict):
+            result = {}
+        for key, contribution in self._accumulators:
+            value = contribution(result)
+            value = 0.0 if np.isnan(value) else value
+            self._contributions[key][slot] = value
+            self._sums[key] += value
+        
+        self.timestamps[slot] = timestamp
+        for section, columns in self.columns.items():
+            values = sections.get(section)
+            if not isinstance(values, dict):
+                values = {}
+            for name, column in columns.items():
+                column.data[slot] = column.encode(values.get(name))
+        self.appended += 1
+        self.version += 1
+        self.size = min(self.size + 1, self.capacity)
+        
+        if self.appended % self.capacity == 0:
+            # Re-sum once per wrap so float error from add/subtract can't drift
+            slots = self.slots()
+            for key, contributions in self._contributions.items():
+                self._sums[key] = float(contributions[slots].sum())
+
+    def drop_oldest(self):
+        self._evict((self.appended - self.size) % self.capacity)
+        self.size -= 1
+        self.version += 1
+
+    def summary(self):
+        """Current aggregates in the /api/stats shape, in constant time"""
+        summary = {'total': self.size}
+        for name, spec in self.stats_spec.items():
+            if spec[0] == 'count':
+                summary[name] = int(round(self._sums[name]))
+            else:
+                n = self._sums[name + ':n']
+                summary[name] = round(float(self._sums[name + ':sum'] / n), 2) if n >= 1 else 0
+        return summary
+
+    def oldest_timestamp(self):
+        return self.timestamps[(self.appended - self.size) % self.capacity]
+
+    def slots(self, limit=None):
+        """Slot indices of the retained rows, oldest first (at most the last `limit`)"""
+        count = self.size if limit is None else max(0, min(limit, self.size))
+        return np.arange(self.appended - count, self.appended) % self.capacity
+
+    def record(self, slot):
+        record = {
+            'timestamp': datetime.fromtimestamp(self.timestamps[slot]).isoformat()
+        }
+        for section, columns in self.columns.items():
+            values = {}
+            for name, column in columns.items():
+                value = column.decode(column.data[slot])
+                if value is not None:
+                    values[name] = value
+            record[section] = values
+        return record
+
+
+class PredictionStore:
+    """Per-module bounded prediction history
+
+    `capacity` is the number of rows kept per module (an int, or a dict of
+    module -> int). With `max_age_seconds` set, rows older than that are
+    dropped as well. Aggregates in `stats()` cover exactly the retained rows.
+    """
+
+    def __init__(self, capacity=10000, max_age_seconds=None, schemas=PREDICTION_SCHEMAS,
+                 stats_specs=STATS_SPECS):
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.RLock()
+        self._changed = threading.Condition(self._lock)
+        self._changes = 0
+        # Distinguishes versions of this store from those of another process/restart
+        self.instance_id = uuid.uuid4().hex[:12]
+        self._buffers = {}
+        for module, schema in schemas.items():
+            module_capacity = capacity.get(module, 10000) if isinstance(capacity, dict) else capacity
+            if module_capacity < 1:
+                raise ValueError(f'Capacity for {module} must be at least 1')
+            self._buffers[module] = ModuleBuffer(schema, module_capacity, stats_specs.get(module))
+
+    @property
+    def modules(self):
+        return list(self._buffers)
+
+    def __contains__(self, module):
+        return module in self._buffers
+
+    def _expire(self, buffer, now=None):
+        if not self.max_age_seconds:
+            return
+        cutoff = (now or time.time()) - self.max_age_seconds
+        expired = False
+        while buffer.size and buffer.oldest_timestamp() < cutoff:
+            buffer.drop_oldest()
+            expired = True
+        if expired:
+            self._notify_change()
+
+    def _notify_change(self):
+        self._changes += 1
+        self._changed.notify_all()
+
+    def append(self, module, input_data, result, timestamp=None):
+        """Record one prediction; the oldest row is overwritten when the buffer is full"""
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            buffer = self._buffers[module]
+            self._expire(buffer, timestamp)
+            buffer.append(timestamp, {'input': input_data, 'result': result})
+            self._notify_change()
+
+    def locked(self):
+        """Context manager holding the store lock, so several reads see one version
+
+        The lock is reentrant: etag(), stats(), columns() etc. work inside it.
+        """
+        return self._lock
+
+    @property
+    def changes(self):
+        """Number of times the stored data has changed (appends and expiries)"""
+        return self._changes
+
+    def versions(self, modules=None):
+        """Monotonically increasing version per module (expiring stale rows first)"""
+        with self._lock:
+            versions = {}
+            for module in modules or self._buffers:
+                buffer = self._buffers[module]
+                self._expire(buffer)
+                versions[module] = buffer.version
+            return versions
+
+    def etag(self, modules=None, extra=''):
+        """Strong ETag value for data derived from the given modules' current versions"""
+        versions = self.versions(modules)
+        tag = '-'.join(f'{module}{version}' for module, version in versions.items())
+        return f'{self.instance_id}-{tag}{"-" + extra if extra else ""}'
+
+    def wait_for_change(self, since, timeout=None):
+        """Block until `changes` moves past `since` (or the timeout passes); returns `changes`"""
+        with self._changed:
+            self._changed.wait_for(lambda: self._changes != since, timeout)
+            return self._changes
+
+    def count(self, module):
+        with self._lock:
+            buffer = self._buffers[module]
+            self._expire(buffer)
+            return buffer.size
+
+    def records(self, module, limit=None):
+        """Return the retained predictions of a module as dicts, oldest first"""
+        with self._lock:
+            buffer = self._buffers[module]
+            self._expire(buffer)
+            return [buffer.record(slot) for slot in buffer.slots(limit)]
+
+    def values(self, module, field, section='result'):
+        """Return one column of the retained rows, oldest first, as a NumPy array"""
+        return self.columns(module, {section: [field]})[section][field]
+
+    def columns(self, module, fields):
+        """Several columns taken under one lock, so they line up row for row
+
+        `fields` maps a section to field names, e.g. {'result': ['status'],
+        'input': ['hour']}; the result has the same shape with NumPy arrays.
+        """
+        with self._lock:
+            buffer = self._buffers[module]
+            self._expire(buffer)
+            slots = buffer.slots()
+            columns = {}
+            for section, names in fields.items():
+                section_columns = buffer.columns[section]
+                columns[section] = {
+                    name: section_columns[name].decode_array(section_columns[name].data[slots])
+                    for name in names
+                }
+            return columns
+
+    def stats(self):
+        """Per-module aggregates plus `total_predictions`, independent of history size"""
+        with self._lock:
+            stats = {}
+            for module, buffer in self._buffers.items():
+                self._expire(buffer)
+                stats[module] = buffer.summary()
+            stats['total_predictions'] = sum(stats[module]['total'] for module in self._buffers)
+            return stats
+
+    def fields(self, module):
+        """Field names per section of a module, e.g. {'input': [...], 'result': [...]}"""
+        return {section: list(columns) for section, columns in self._buffers[module].columns.items()}
+
+    def next_sequences(self, modules=None):
+        """Sequence number the next appended row of each module will get"""
+        with self._lock:
+            return {module: self._buffers[module].appended for module in modules or self._buffers}
+
+    def cursor(self, module, seq):
+        """Opaque cursor for the position just before row `seq` of `module`"""
+        raw = json.dumps([self.instance_id, module, int(seq)], separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def parse_cursor(self, cursor):
+        """(module, seq) of a cursor from `cursor`; raises ValueError if it isn't one of ours"""
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            instance_id, module, seq = json.loads(raw)
+            seq = int(seq)
+        except (ValueError, TypeError):
+            raise ValueError('Invalid cursor')
+        if instance_id != self.instance_id:
+            raise ValueError('Cursor is from another server instance or an earlier restart')
+        if module not in self._buffers or seq < 0:
+            raise ValueError('Invalid cursor')
+        return module, seq
+
+    def _read(self, module, start, stop, limit):
+        """Retained rows with seq in [start, stop), at most `limit`; returns (first seq, records)"""
+        with self._lock:
+            buffer = self._buffers[module]
+            self._expire(buffer)
+            start = max(start, buffer.appended - buffer.size)
+            stop = min(stop, buffer.appended, start + limit)
+            return start, [buffer.record(seq % buffer.capacity) for seq in range(start, stop)]
+
+    def iter_records(self, modules=None, start=None, stop=None, chunk_size=1000):
+        """Yield (module, seq, record) module by module, oldest first
+
+        `start` is a (module, seq) position from parse_cursor(); rows of that
+        module before seq and all earlier modules are skipped. `stop` maps a
+        module to the seq to stop before (default: read until caught up).
+        The lock is only held per chunk of `chunk_size` rows, so appends
+        carry on during a long export; rows evicted meanwhile are skipped.
+        """
+        modules = list(modules or self._buffers)
+        first_module, seq = start if start else (modules[0], 0)
+        if first_module not in modules:
+            raise ValueError(f'Cursor is for module {first_module}')
+        for module in modules[modules.index(first_module):]:
+            if module != first_module:
+                seq = 0
+            end = stop[module] if stop and module in stop else float('inf')
+            while seq < end:
+                first, records = self._read(module, seq, end, chunk_size)
+                if not records:
+                    break
+                for offset, record in enumerate(records):
+                    yield module, first + offset, record
+                seq = first + len(records)
@@ -0,0 +1,237 @@
+"""
+On-demand Request Profiling
+
+Runs a sample of requests under cProfile and keeps the pstats files per route
+in a rotating directory, so a slow endpoint can be inspected in production
+without redeploying:
+
+- PROFILING_ENABLED=1 profiles PROFILING_SAMPLE_RATE of all requests
+- with PROFILING_ADMIN_TOKEN set, a request carrying the header
+  `X-Profile: <token>` is always profiled, even when sampling is off
+
+GET /api/profiling/summary lists the top cumulative-time functions per route
+and how the time splits across libraries (pandas, sklearn, tensorflow, ...).
+It needs the admin token, so it is closed unless PROFILING_ADMIN_TOKEN is set.
+Long-lived views (the SSE stats stream) are marked with `@unprofiled`: a
+profile of one would hold the profiler for minutes and record mostly waiting.
+"""
+
+import cProfile
+import hmac
+import os
+import pstats
+import random
+import re
+import tempfile
+import threading
+import time
+
+from flask import current_app, g, jsonify, request
+
+PROFILE_HEADER = 'X-Profile'
+ROUTE_FILE = 'route.txt'
+
+# Libraries reported separately in the per-route time breakdown
+TRACKED_PACKAGES = ['pandas', 'sklearn', 'tensorflow', 'keras', 'numpy', 'reportlab',
+                    'matplotlib', 'joblib', 'flask', 'werkzeug']
+
+
+def unprofiled(view):
+    """Mark a view function as never profiled"""
+    view.unprofiled = True
+    return view
+
+
+def _env_flag(name):
+    return os.getenv(name, '0').lower() in ('1', 'true', 'yes')
+
+
+def _route_slug(rule):
+    return re.sub(r'[^A-Za-z0-9]+', '_', rule).strip('_') or 'root'
+
+
+def _package_of(filename, name):
+    """Attribute a profiled function to a tracked library, the app or 'other'"""
+    path = filename.replace('\\', '/')
+    for package in TRACKED_PACKAGES:
+        # Builtins have filename '~'; C methods name their module, e.g. "<method 'dot' of 'numpy.ndarray'>"
+        if f'/{package}/' in path or (path == '~' and f"'{package}." in name):
+            return package
+    if '/site-packages/' in path or path.startswith('~') or path.startswith('<'):
+        return 'other'
+    return 'app'
+
+
+class RequestProfiler:
+    """Decides which requests to profile and stores/summarizes the results
+
+    Only one request per process is profiled at a time (cProfile can't nest),
+    so a sampled request that arrives while another is being profiled simply
+    runs unprofiled.
+    """
+
+    def __init__(self, directory=None, sample_rate=0.0, admin_token=None, max_files=50):
+        self.directory = directory or os.path.join(tempfile.gettempdir(), 'smartcity-profiles')
+        self.sample_rate = sample_rate
+        self.admin_token = admin_token
+        self.max_files = max_files
+        self._active = threading.Lock()
+
+    def _requested(self):
+        token = request.headers.get(PROFILE_HEADER)
+        return bool(self.admin_token and token and hmac.compare_digest(token, self.admin_token))
+
+    def authorized(self):
+        """Whether this request may read profiles (only with the admin token, so never without one)"""
+        return self._requested()
+
+    def start(self):
+        view = current_app.view_functions.get(request.endpoint)
+        if getattr(view, 'unprofiled', False):
+            return
+        if not (self._requested() or (self.sample_rate and random.random() < self.sample_rate)):
+            return
+        if not self._active.acquire(blocking=False):
+            return
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler (e.g. a debugger) already owns the hook
+            self._active.release()
+            return
+        g.profile = profile
+
+    def stop(self):
+        profile = g.pop('profile', None)
+        if profile is None:
+            return
+        try:
+            profile.disable()
+            rule = request.url_rule.rule if request.url_rule else 'unmatched'
+            self._save(rule, profile)
+        except Exception as e:
+            print(f"[WARNING] Could not save request profile: {e}")
+        finally:
+            self._active.release()
+
+    def _save(self, rule, profile):
+        route_dir = os.path.join(self.directory, _route_slug(rule))
+        os.makedirs(route_dir, exist_ok=True)
+        route_file = os.path.join(route_dir, ROUTE_FILE)
+        if not os.path.exists(route_file):
+            with open(route_file, 'w') as f:
+                f.write(rule)
+        filename = f'{time.time():.6f}-{os.getpid()}.pstats'
+        profile.dump_stats(os.path.join(route_dir, filename))
+        self._rotate(route_dir)
+
+    def _profiles(self, route_dir):
+        """pstats files of one route, oldest first"""
+        return sorted(f for f in os.listdir(route_dir) if f.endswith('.pstats'))
+
+    def _rotate(self, route_dir):
+        profiles = self._profiles(route_dir)
+        for filename in profiles[:max(0, len(profiles) - self.max_files)]:
+            try:
+                os.remove(os.path.join(route_dir, filename))
+            except FileNotFoundError:
+                pass  # another worker rotated it first
+
+    def summary(self, route=None, limit=20):
+        """Top cumulative-time functions and per-library time for each profiled route"""
+        routes = {}
+        if not os.path.isdir(self.directory):
+            return routes
+        for slug in sorted(os.listdir(self.directory)):
+            route_dir = os.path.join(self.directory, slug)
+            if not os.path.isdir(route_dir):
+                continue
+            try:
+                with open(os.path.join(route_dir, ROUTE_FILE)) as f:
+                    rule = f.read().strip()
+            except OSError:
+                rule = slug
+            if route and route not in (rule, slug):
+                continue
+
+            paths = [os.path.join(route_dir, f) for f in self._profiles(route_dir)]
+            stats = None
+            for path in paths:
+                try:
+                    if stats is None:
+                        stats = pstats.Stats(path)
+                    else:
+                        stats.add(path)
+                except (OSError, EOFError, TypeError, ValueError):
+                    continue  # rotated away or still being written
+            if stats is None:
+                continue
+            routes[rule] = self._summarize(stats, len(paths), limit)
+        return routes
+
+    def _summarize(self, stats, samples, limit):
+        entries = []
+        packages = {}
+        for (filename, line, name), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+            entries.append((cumtime, tottime, ncalls, f'{filename}:{line}({name})'))
+            package = _package_of(filename, name)
+            packages[package] = packages.get(package, 0.0) + tottime
+        entries.sort(reverse=True)
+        total = sum(packages.values())
+        return {
+            'samples': samples,
+            'total_seconds': round(stats.total_tt, 4),
+            'avg_seconds': round(stats.total_tt / samples, 4) if samples else 0,
+            'top_functions': [
+                {
+                    'function': function,
+                    'calls': ncalls,
+                    'cumulative_seconds': round(cumtime, 4),
+                    'own_seconds': round(tottime, 4)
+                }
+                for cumtime, tottime, ncalls, function in entries[:limit]
+            ],
+            'time_by_package': {
+                package: {
+                    'seconds': round(seconds, 4),
+                    'percent': round(100 * seconds / total, 1) if total else 0
+                }
+                for package, seconds in sorted(packages.items(), key=lambda item: -item[1])
+            }
+        }
+
+
+def init_profiling(app):
+    """Register the profiling hooks and GET /api/profiling/summary; returns the profiler"""
+    profiler = RequestProfiler(
+        directory=os.getenv('PROFILING_DIR'),
+        sample_rate=float(os.getenv('PROFILING_SAMPLE_RATE', 0.01)) if _env_flag('PROFILING_ENABLED') else 0.0,
+        admin_token=os.getenv('PROFILING_ADMIN_TOKEN') or None,
+        max_files=int(os.getenv('PROFILING_MAX_FILES', 50))
+    )
+
+    if profiler.sample_rate or profiler.admin_token:
+        app.before_request(profiler.start)
+        app.teardown_request(lambda exc: profiler.stop())
+
+    @app.route('/api/profiling/summary', methods=['GET'])
+    @unprofiled
+    def profiling_summary():
+        """Top cumulative-time functions per profiled route"""
+        if not profiler.admin_token:
+            return jsonify({'error': 'Profiles are only readable with PROFILING_ADMIN_TOKEN set'}), 403
+        if not profiler.authorized():
+            return jsonify({'error': f'{PROFILE_HEADER} header required'}), 403
+        try:
+            limit = max(1, min(request.args.get('limit', 20, type=int), 200))
+            return jsonify({
+                'enabled': bool(profiler.sample_rate or profiler.admin_token),
+                'sample_rate': profiler.sample_rate,
+                'directory': profiler.directory,
+                'routes': profiler.summary(request.args.get('route'), limit)
+            })
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+
+    return profiler
@@ -0,0 +1,140 @@
+"""
+Background PDF Report Jobs
+
+Builds PDF reports in a small thread pool instead of the request thread and
+keeps the finished PDFs in memory, keyed by the prediction store version
+they were built from. Each job carries the data snapshot it renders, so its
+key always matches its PDF. Asking again for a report of unchanged data
+returns the finished job straight away, and new versions submitted while a
+build is still waiting for a thread replace its snapshot instead of queueing
+another build.
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ReportJob:
+    """One report build: queued -> running -> done | failed"""
+
+    def __init__(self, key, snapshot):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.snapshot = snapshot
+        self.status = 'queued'
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.pdf = None
+        self.error = None
+
+    def to_dict(self):
+        info = {
+            'job_id': self.id,
+            'status': self.status,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+        if self.finished_at and self.started_at:
+            info['build_seconds'] = round(self.finished_at - self.started_at, 3)
+        if self.pdf is not None:
+            info['size_bytes'] = len(self.pdf)
+        if self.error:
+            info['error'] = self.error
+        return info
+
+
+class ReportJobQueue:
+    """Bounded pool of report builds with a per-version result cache
+
+    `build` is called with a job's snapshot in a pool thread and returns the
+    PDF bytes. `max_workers` bounds concurrent builds and at most one job is
+    queued behind them; at most `max_jobs` jobs are remembered, and when that
+    is exceeded the oldest finished ones (and their PDFs) are dropped first.
+    """
+
+    def __init__(self, build, max_workers=2, max_jobs=16):
+        self._build = build
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='report')
+        self._max_jobs = max_jobs
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._by_key = {}
+        self._queued = None
+
+    def find(self, key):
+        """The job building or built for data version `key` (None if there is none or it failed)"""
+        with self._lock:
+            return self._find(key)
+
+    def _find(self, key):
+        job = self._jobs.get(self._by_key.get(key))
+        if job is None or job.status == 'failed':
+            return None
+        self._jobs.move_to_end(job.id)
+        return job
+
+    def submit(self, key, snapshot):
+        """Start a report of `snapshot` (data version `key`), or return the job already covering it
+
+        If a job is still queued, it takes over the newer snapshot and key
+        instead, so its waiting clients get the latest data and the queue
+        never holds more than one build.
+        """
+        with self._lock:
+            existing = self._find(key)
+            if existing is not None:
+                return existing
+            job = self._queued
+            if job is not None:
+                if self._by_key.get(job.key) == job.id:
+                    del self._by_key[job.key]
+                job.key, job.snapshot = key, snapshot
+                self._by_key[key] = job.id
+                self._jobs.move_to_end(job.id)
+                return job
+            job = ReportJob(key, snapshot)
+            self._jobs[job.id] = job
+            self._by_key[key] = job.id
+            self._queued = job
+            self._evict()
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job):
+        with self._lock:
+            job.status = 'running'
+            job.started_at = time.time()
+            snapshot, job.snapshot = job.snapshot, None
+            if self._queued is job:
+                self._queued = None
+        try:
+            job.pdf = self._build(snapshot)
+            job.status = 'done'
+        except Exception as e:
+            job.error = str(e)
+            job.status = 'failed'
+            print(f"[ERROR] Report job {job.id} failed: {e}")
+        finally:
+            job.finished_at = time.time()
+
+    def _evict(self):
+        """Drop the oldest finished jobs beyond max_jobs (in-progress jobs are kept)"""
+        excess = len(self._jobs) - self._max_jobs
+        for job_id in list(self._jobs):
+            if excess <= 0:
+                break
+            job = self._jobs[job_id]
+            if job.status in ('done', 'failed'):
+                del self._jobs[job_id]
+                if self._by_key.get(job.key) == job_id:
+                    del self._by_key[job.key]
+                excess -= 1
@@ -0,0 +1,87 @@
+"""
+Per-module Report Summaries
+
+Summaries for the PDF report computed with a few vectorized NumPy passes over
+the prediction store's columns: row/success/error counts, percentiles of the
+module's main predicted value, category counts and an hour-of-day breakdown.
+Their size is fixed, so a report costs the same memory whether the store
+holds a hundred predictions or a million; only the last few rows are turned
+into dicts for the detail tables.
+"""
+
+import numpy as np
+
+from utils.charts import CHART_FIELDS, category_counts
+
+PERCENTILES = [25, 50, 75, 95]
+
+# Main numeric result, categorical result and whether the input has an hour of day
+SUMMARY_FIELDS = {
+    'traffic': {'value': 'predicted_vehicle_count', 'category': 'congestion_level', 'hourly': True},
+    'energy': {'value': 'predicted_consumption_kwh', 'hourly': True},
+    'water': {'value': 'predicted_consumption_liters'},
+    'waste': {'value': 'predicted_fill_level_percent', 'category': 'collection_needed'},
+    'air': {'category': 'predicted_quality'}
+}
+
+
+def report_fields(module):
+    """Store columns (PredictionStore.columns format) needed for a module's summary and charts"""
+    spec = SUMMARY_FIELDS.get(module, {})
+    result = ['status'] + [spec[key] for key in ('value', 'category') if key in spec]
+    result += [field for field in CHART_FIELDS.get(module, []) if field not in result]
+    return {'result': result, 'input': ['hour'] if spec.get('hourly') else []}
+
+
+def _round(value):
+    return round(float(value), 2)
+
+
+def module_summary(module, columns):
+    """Fixed-size summary of one module from its `report_fields` columns"""
+    spec = SUMMARY_FIELDS.get(module, {})
+    result = columns['result']
+    ok = result['status'] == 'success'
+    summary = {
+        'count': int(len(ok)),
+        'success': int(ok.sum()),
+        'errors': int(len(ok) - ok.sum()),
+        'value': None,
+        'categories': {},
+        'hourly': []
+    }
+
+    values = None
+    if 'value' in spec:
+        values = result[spec['value']]
+        valid = ok & ~np.isnan(values)
+        if valid.any():
+            ranked = values[valid]
+            quantiles = np.percentile(ranked, PERCENTILES)
+            summary['value'] = {
+                'field': spec['value'],
+                'min': _round(ranked.min()),
+                'max': _round(ranked.max()),
+                'mean': _round(ranked.mean()),
+                **{f'p{p}': _round(q) for p, q in zip(PERCENTILES, quantiles)}
+            }
+
+    if 'category' in spec:
+        names, counts = category_counts(result[spec['category']][ok])
+        summary['categories'] = dict(zip(names, counts))
+
+    if spec.get('hourly'):
+        hours = columns['input']['hour']
+        valid = ok & ~np.isnan(hours) & (hours >= 0) & (hours < 24)
+        hour_index = hours[valid].astype(np.int64)
+        counts = np.bincount(hour_index, minlength=24)
+        means = None
+        if values is not None:
+            weights = np.nan_to_num(values[valid])
+            means = np.bincount(hour_index, weights=weights, minlength=24) / np.maximum(counts, 1)
+        summary['hourly'] = [
+            {'hour': hour, 'count': int(counts[hour]),
+             **({'mean': _round(means[hour])} if means is not None else {})}
+            for hour in np.flatnonzero(counts).tolist()
+        ]
+    return summary
@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { Link } from 'react-router-dom';
-import { getStats } from '../services/api';
+import { getStats, subscribeStats } from '../services/api';
 import './Dashboard.css';
 
 const Dashboard = () => {
@@ -12,8 +12,22 @@ const Dashboard = () => {
     const settings = JSON.parse(localStorage.getItem('appSettings') || '{}');
     if (settings.autoRefresh !== false) {
       const interval = (settings.refreshInterval || 30) * 1000;
-      const timer = setInterval(fetchStats, interval);
-      return () => clearInterval(timer);
+      let timer = null;
+      const startPolling = () => {
+        if (!timer) timer = setInterval(fetchStats, interval);
+      };
+
+      // Push updates from the server; fall back to polling if the stream fails
+      const unsubscribe = subscribeStats((delta) => {
+        setStats((prev) => ({ ...(prev || {}), ...delta }));
+        setLoading(false);
+      }, startPolling);
+      if (!unsubscribe) startPolling();
+
+      return () => {
+        if (unsubscribe) unsubscribe();
+        if (timer) clearInterval(timer);
+      };
     }
   }, []);
 
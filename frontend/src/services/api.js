@@ -46,27 +46,111 @@ export const predictAirQuality = async (data) => {
   return response.data;
 };
 
+// Forecast APIs - a whole horizon in one request
+export const forecastEnergy = async (data) => {
+  const response = await api.post('/forecast/energy', data);
+  return response.data;
+};
+
+export const forecastTraffic = async (data) => {
+  const response = await api.post('/forecast/traffic', data);
+  return response.data;
+};
+
+export const forecastWater = async (data = {}) => {
+  const response = await api.post('/forecast/water', data);
+  return response.data;
+};
+
+// Conditional GET: remember each response's ETag and reuse the cached
+// body when the server answers 304 Not Modified
+const etagCache = new Map();
+
+const conditionalGet = async (url, params = {}) => {
+  const key = `${url}?${new URLSearchParams(params).toString()}`;
+  const cached = etagCache.get(key);
+  const response = await api.get(url, {
+    params,
+    headers: cached ? { 'If-None-Match': cached.etag } : {},
+    validateStatus: (status) => (status >= 200 && status < 300) || status === 304,
+  });
+  if (response.status === 304 && cached) return cached.data;
+  const etag = response.headers.etag;
+  if (etag) etagCache.set(key, { etag, data: response.data });
+  return response.data;
+};
+
 // Stats APIs
 export const getStats = async () => {
-  const response = await api.get('/api/stats');
-  return response.data;
+  return conditionalGet('/api/stats');
+};
+
+// Live stats via Server-Sent Events. onStats receives the modules whose
+// stats changed; onError fires once if the stream can't be used.
+// Returns an unsubscribe function, or null if EventSource isn't supported.
+export const subscribeStats = (onStats, onError) => {
+  if (typeof window === 'undefined' || !window.EventSource) return null;
+  const source = new EventSource(`${API_BASE_URL}/api/stats/stream`);
+  source.onmessage = (event) => {
+    onStats(JSON.parse(event.data));
+  };
+  source.onerror = () => {
+    // Still reconnecting on its own after a normal stream rotation
+    if (source.readyState === EventSource.CONNECTING) return;
+    source.close();
+    if (onError) onError();
+  };
+  return () => source.close();
 };
 
 export const getPredictions = async (module = null, limit = 100) => {
   const params = { limit };
   if (module) params.module = module;
-  const response = await api.get('/api/predictions', { params });
-  return response.data;
+  return conditionalGet('/api/predictions', params);
 };
 
 // PDF Download
+const REPORT_POLL_MS = 500;
+const REPORT_TIMEOUT_MS = 120000;
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// Start a background report build and wait for it; null if the job is gone
+// (e.g. a poll reached another backend worker)
+const fetchReportJob = async () => {
+  let { data: job } = await api.post('/api/reports');
+  const deadline = Date.now() + REPORT_TIMEOUT_MS;
+  while (job.status === 'queued' || job.status === 'running') {
+    if (Date.now() > deadline) throw new Error('Timed out waiting for the PDF report');
+    await sleep(REPORT_POLL_MS);
+    try {
+      job = (await api.get(job.status_url)).data;
+    } catch (error) {
+      if (error.response && error.response.status === 404) return null;
+      throw error;
+    }
+  }
+  if (job.status === 'failed') throw new Error(job.error || 'Error generating PDF');
+  try {
+    const response = await api.get(job.result_url, { responseType: 'blob' });
+    return response.data;
+  } catch (error) {
+    if (error.response && error.response.status === 404) return null;
+    throw error;
+  }
+};
+
 export const downloadPDFReport = async () => {
-  const response = await api.get('/api/generate-pdf', {
-    responseType: 'blob', // Important for file download
-  });
+  let pdf = await fetchReportJob();
+  if (!pdf) {
+    const response = await api.get('/api/generate-pdf', {
+      responseType: 'blob', // Important for file download
+    });
+    pdf = response.data;
+  }
   
   // Create blob and download
-  const url = window.URL.createObjectURL(new Blob([response.data]));
+  const url = window.URL.createObjectURL(new Blob([pdf]));
   const link = document.createElement('a');
   link.href = url;
   link.setAttribute('download', `smart_city_report_${new Date().toISOString().split('T')[0]}.pdf`);